@@ -1,98 +1,197 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-import pickle
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response, url_for, abort
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
-from sklearn.model_selection import cross_val_score, train_test_split
-import joblib
+import argparse
+import hmac
 import logging
+import mimetypes
 import os
+import threading
+import time
+
+from audio_features import extract_bytes
+from bundles import BUNDLE_ROOT, CURRENT_FILE, ModelBundle, resolve_version, set_current_version
+from data_loader import load_dataset
+from dataset_stats import load_stats
+from evaluation import classification_metrics
+from metrics_cache import fingerprint_files, load_cached_metrics, save_cached_metrics
+from model_registry import ModelRegistry, load_artifact
+from feature_schema import SchemaError
+from instrumentation import MetricsRegistry, StageTimer, BATCH_SIZE_BUCKETS
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache, feature_key
+from splits import load_split
+from static_assets import ASSETS_DIR, IMMUTABLE_MAX_AGE, build_assets, choose_encoding, load_manifest, manifest_mtime
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Load the models and scaler
-try:
-    models = {
-        'Random Forest': joblib.load('rf_clf.pkl'),
-        'SVM': joblib.load('svm_clf.pkl'),
-        'KNN': joblib.load('knn_clf.pkl'),
-        'Decision Tree': joblib.load('dt_clf.pkl'),
-        'Naive Bayes': joblib.load('nb_clf.pkl'),
-        'Logistic Regression': joblib.load('lg_clf.pkl')
-    }
-    logger.info("Successfully loaded all models")
-except Exception as e:
-    logger.error(f"Error loading models: {str(e)}")
-    raise
+# Latency and throughput instrumentation, exposed at /metrics
+SERVER_TIMING = os.environ.get('SERVER_TIMING') == '1'
+metrics_registry = MetricsRegistry()
+request_seconds = metrics_registry.histogram(
+    'pd_request_duration_seconds', 'Request latency by endpoint', ['endpoint'])
+stage_seconds = metrics_registry.histogram(
+    'pd_stage_duration_seconds', 'Time spent in each request stage', ['stage'])
+model_seconds = metrics_registry.histogram(
+    'pd_model_inference_seconds', 'Inference time per model call', ['model'])
+batch_rows = metrics_registry.histogram(
+    'pd_inference_batch_rows', 'Rows scored per model call', ['endpoint'], buckets=BATCH_SIZE_BUCKETS)
+out_of_distribution = metrics_registry.counter(
+    'pd_out_of_distribution_total', 'Input values outside the training range by feature', ['feature'])
+cache_lookups = metrics_registry.counter(
+    'pd_prediction_cache_lookups_total', 'Prediction cache lookups by outcome', ['outcome'])
+
+def record_inference(endpoint, result, n_rows, scale_seconds):
+    stage_seconds.observe(scale_seconds, stage='scale')
+    for model_name, seconds in result.timings.items():
+        model_seconds.observe(seconds, model=model_name)
+    batch_rows.observe(n_rows, endpoint=endpoint)
 
+def check_distribution(current, features):
+    """Names of the out-of-range features of each row, or None without dataset statistics"""
+    if current.distribution is None:
+        return None
+    flagged = current.distribution.flagged(features)
+    for row in flagged:
+        for feature in row:
+            out_of_distribution.inc(feature=feature)
+    return flagged
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.timer = StageTimer(stage_seconds)
+
+@app.after_request
+def finish_request_timer(response):
+    elapsed = time.perf_counter() - g.request_start
+    request_seconds.observe(elapsed, endpoint=request.endpoint or 'unknown')
+    if SERVER_TIMING:
+        g.timer.record('total', elapsed, observe=False)
+        response.headers['Server-Timing'] = g.timer.server_timing()
+    return response
+
+MODEL_FILES = {
+    'Random Forest': 'rf_clf.pkl',
+    'SVM': 'svm_clf.pkl',
+    'KNN': 'knn_clf.pkl',
+    'Decision Tree': 'dt_clf.pkl',
+    'Naive Bayes': 'nb_clf.pkl',
+    'Logistic Regression': 'lg_clf.pkl'
+}
+SCALER_FILE = 'scaler.pkl'
+DATASET_FILE = 'data.csv'
+
+LAZY_MODEL_LOADING = os.environ.get('LAZY_MODEL_LOADING') == '1'
+# 'cascade' stops running models once a request's majority vote is decided
+DEFAULT_VOTING = os.environ.get('DEFAULT_VOTING', 'hard')
+
+def attach_dataset_stats(current):
+    """Attach the precomputed summary of the bundle's dataset; serving continues without it"""
+    try:
+        current.attach_dataset_stats(load_stats(load_dataset(current.manifest.get('dataset', DATASET_FILE))))
+    except Exception as e:
+        logger.warning(f"Dataset statistics unavailable, skipping distribution checks: {str(e)}")
+    return current
+
+def load_serving_bundle(version=None):
+    """Load the pinned or current model bundle, falling back to the flat legacy pickles"""
+    if resolve_version(version) is not None:
+        return attach_dataset_stats(ModelBundle.load(version, lazy=LAZY_MODEL_LOADING))
+
+    models = ModelRegistry(MODEL_FILES)
+    if not LAZY_MODEL_LOADING:
+        models.load_all()
+    scaler, scaler_stats = load_artifact(SCALER_FILE)
+    feature_columns = load_dataset(DATASET_FILE).feature_columns
+    return attach_dataset_stats(ModelBundle('legacy', models, scaler, feature_columns,
+                                            manifest={'dataset': DATASET_FILE}, scaler_stats=scaler_stats))
+
+# Static files and figures under content-hashed names, rebuilt when their contents change
 try:
-    with open('scaler.pkl', 'rb') as f:
-        scaler = pickle.load(f)
-    logger.info("Successfully loaded scaler")
-except Exception as e:
-    logger.error(f"Error loading scaler: {str(e)}")
-    raise
+    build_assets()
+except OSError as e:
+    logger.warning(f"Serving unhashed static files: {str(e)}")
+# (manifest mtime, logical path -> hashed name, hashed names that may be served)
+_assets = (None, {}, set())
+
+def current_assets():
+    """Return the asset manifest and servable names, reloaded when a rebuild rewrites the manifest
+
+    Names from the previously loaded manifest stay servable, since build_assets
+    keeps the previous build's files for pages rendered before the rebuild.
+    """
+    global _assets
+    mtime = manifest_mtime()
+    if mtime != _assets[0]:
+        manifest = load_manifest()
+        _assets = (mtime, manifest, set(manifest.values()) | set(_assets[1].values()))
+    return _assets[1], _assets[2]
+
+current_assets()
+
+@app.context_processor
+def static_asset_urls():
+    asset_manifest, _ = current_assets()
+
+    def asset_url(path, fallback=None):
+        """Hashed URL of ``path``, else of ``fallback`` (e.g. the PNG of a figure without web renditions)"""
+        for candidate in (path, fallback):
+            if candidate in asset_manifest:
+                return url_for('hashed_asset', filename=asset_manifest[candidate])
+        return url_for('static', filename=fallback or path)
+
+    def has_asset(path):
+        return path in asset_manifest
+    return {'asset_url': asset_url, 'has_asset': has_asset}
 
-# Load the dataset for performance calculation
+prediction_cache = PredictionCache(maxsize=int(os.environ.get('PREDICTION_CACHE_SIZE', 1024)),
+                                   ttl=float(os.environ.get('PREDICTION_CACHE_TTL', 3600)))
+
+# Load the models and scaler
 try:
-    data = pd.read_csv('data.csv')
-    X = data.drop(['status', 'name'], axis=1)
-    y = data['status']
-    logger.info("Successfully loaded dataset")
+    bundle = load_serving_bundle()
+    logger.info(f"Successfully loaded model bundle {bundle.version}")
+    # The dashboard form must post names the schema accepts, or the main UI cannot predict
+    bundle.schema.check_form(os.path.join(app.root_path, app.template_folder, 'index.html'))
 except Exception as e:
-    logger.error(f"Error loading dataset: {str(e)}")
+    logger.error(f"Error loading models: {str(e)}")
     raise
 
-# Split the data for evaluation
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+def load_evaluation_data(current):
+    """Load the bundle's dataset and return the scaled held-out split used for metrics"""
+    try:
+        dataset = load_dataset(current.manifest.get('dataset', DATASET_FILE))
+        X = dataset.X[current.feature_columns]
+        y = dataset.y
+        logger.info("Successfully loaded dataset")
+    except Exception as e:
+        logger.error(f"Error loading dataset: {str(e)}")
+        raise
+
+    # Held-out subjects of the shared grouped split
+    test = load_split(dataset).test
+    return current.scaler.transform(X.iloc[test]), y.iloc[test]
 
-# Scale the features
-X_train_scaled = scaler.transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+def calculate_model_metrics(current):
+    holdout = current.holdout_predictions()
+    if holdout is not None:
+        # Held-out predictions stored at training time; no model inference needed
+        y_test, _, predictions = holdout
+        return {model_name: classification_metrics(y_test, y_pred, y_proba)
+                for model_name, (y_pred, y_proba) in predictions.items()}
 
-def calculate_model_metrics():
+    X_test_scaled, y_test = load_evaluation_data(current)
     metrics = {}
-    for model_name, model in models.items():
+    for model_name, model in current.models.items():
         try:
-            # Train the model
-            model.fit(X_train_scaled, y_train)
-            
-            # Make predictions
+            # Make predictions with the served model as loaded (no refit)
             y_pred = model.predict(X_test_scaled)
-            
-            # Calculate metrics
-            accuracy = accuracy_score(y_test, y_pred)
-            precision = precision_score(y_test, y_pred)
-            recall = recall_score(y_test, y_pred)
-            f1 = f1_score(y_test, y_pred)
-            
-            # Calculate confusion matrix
-            cm = confusion_matrix(y_test, y_pred)
-            tn, fp, fn, tp = cm.ravel()
-            
-            # Calculate additional metrics
-            specificity = tn / (tn + fp)  # True Negative Rate
-            sensitivity = tp / (tp + fn)  # True Positive Rate
-            
-            metrics[model_name] = {
-                'accuracy': float(accuracy),
-                'precision': float(precision),
-                'recall': float(recall),
-                'f1Score': float(f1),
-                'specificity': float(specificity),
-                'sensitivity': float(sensitivity),
-                'confusion_matrix': {
-                    'true_negative': int(tn),
-                    'false_positive': int(fp),
-                    'false_negative': int(fn),
-                    'true_positive': int(tp)
-                }
-            }
+            metrics[model_name] = classification_metrics(y_test, y_pred)
             logger.info(f"Successfully calculated metrics for {model_name}")
         except Exception as e:
             logger.error(f"Error calculating metrics for {model_name}: {str(e)}")
@@ -101,6 +200,35 @@ def calculate_model_metrics():
     logger.debug(f"Calculated metrics: {metrics}")
     return metrics
 
+_metrics_lock = threading.Lock()
+_model_metrics = (None, None)
+
+def artifacts_fingerprint(current):
+    paths = list(current.models.artifacts.values())
+    paths += [current.scaler_stats['path'], current.manifest.get('dataset', DATASET_FILE)]
+    # Metrics cached before evaluation moved to the grouped split are not reused
+    return f"{fingerprint_files(paths)}-grouped"
+
+def get_model_metrics(refresh=False):
+    """Return metrics for the serving bundle, computing them only when the artifacts have changed"""
+    global _model_metrics
+    current = bundle
+    with _metrics_lock:
+        version, metrics = _model_metrics
+        if version == current.version and not refresh:
+            return metrics
+        if current.metrics and not refresh:
+            metrics = current.metrics
+        else:
+            fingerprint = artifacts_fingerprint(current)
+            metrics = None if refresh else load_cached_metrics(fingerprint)
+            if metrics is None:
+                metrics = calculate_model_metrics(current)
+                save_cached_metrics(fingerprint, metrics)
+                logger.info("Computed and cached model metrics")
+        _model_metrics = (current.version, metrics)
+        return metrics
+
 def get_accuracy_class(accuracy):
     if accuracy >= 0.85:
         return 'accuracy-high'
@@ -111,53 +239,354 @@ def get_accuracy_class(accuracy):
 
 @app.route('/')
 def home():
+    # The page shell renders without metrics; the browser fetches them from /api/metrics
     try:
-        # Calculate model metrics
-        model_metrics = calculate_model_metrics()
-        logger.debug(f"Model metrics being sent to template: {model_metrics}")
-        return render_template('index.html', model_metrics=model_metrics, get_accuracy_class=get_accuracy_class)
+        return render_template('index.html', get_accuracy_class=get_accuracy_class)
     except Exception as e:
         logger.error(f"Error in home route: {str(e)}")
         return str(e), 500
 
+@app.route('/api/metrics')
+def metrics_json():
+    """Model metrics and dataset summary for the dashboard, revalidated with an ETag"""
+    try:
+        with g.timer.stage('metrics'):
+            model_metrics = get_model_metrics()
+        current = bundle
+        response = jsonify({
+            'success': True,
+            'version': current.version,
+            'metrics': model_metrics,
+            'dataset_summary': current.dataset_stats.summary() if current.dataset_stats is not None else []
+        })
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Error loading dashboard metrics: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def score_single_rows(group, features):
+    """Score stacked /predict rows and return one response dict per row"""
+    current, voting = group
+    
+    # Scale features
+    start = time.perf_counter()
+    features_scaled = current.scaler.transform(features)
+    scale_seconds = time.perf_counter() - start
+    
+    # Single probability pass per model, combined by the requested vote
+    result = current.scorer.score(features_scaled, voting=voting)
+    record_inference('predict', result, len(features), scale_seconds)
+    timings_ms = result.timings_ms()
+    
+    return [{
+        'success': True,
+        'overall_prediction': int(result.overall[i]),
+        'ensemble_probability': result.row_probability(i),
+        'calibrated': result.calibrated,
+        'model_predictions': result.model_predictions(i),
+        'models_run': result.models_run(i),
+        'timings_ms': timings_ms,
+        'batch_size': len(features)
+    } for i in range(len(features))]
+
+MICRO_BATCH_SIZE = int(os.environ.get('MICRO_BATCH_SIZE', 1))
+micro_batcher = MicroBatcher(score_single_rows,
+                             max_batch_size=MICRO_BATCH_SIZE,
+                             max_wait=float(os.environ.get('MICRO_BATCH_WAIT_MS', 2)) / 1000.0,
+                             workers=int(os.environ.get('INFERENCE_THREADS', 2))) if MICRO_BATCH_SIZE > 1 else None
+
+def predict_features(current, features, voting, extra=None):
+    """Score one parsed row through the prediction cache and micro-batcher"""
+    flagged = check_distribution(current, features)
+    extra = dict(extra or {})
+    if flagged is not None:
+        extra['out_of_distribution'] = flagged[0]
+
+    # Resubmitted forms and replayed history entries are served from the cache
+    with g.timer.stage('cache'):
+        cache_key = feature_key(current.version, features, voting)
+        response = prediction_cache.get(cache_key)
+    cache_lookups.inc(outcome='hit' if response is not None else 'miss')
+    if response is not None:
+        return jsonify(dict(response, cached=True, **extra))
+
+    # Concurrent requests are merged into one vectorized call when micro-batching is on
+    with g.timer.stage('inference'):
+        if micro_batcher is not None:
+            response = micro_batcher.submit((current, voting), features).result()
+        else:
+            response = score_single_rows((current, voting), features)[0]
+    for model_name, ms in response['timings_ms'].items():
+        g.timer.record(model_name, ms / 1000.0, observe=False)
+    prediction_cache.put(cache_key, response)
+    return jsonify(dict(response, cached=False, **extra))
+
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        # Get input data
-        data = request.get_json()
-        features = np.array([float(data[feature]) for feature in data.keys()]).reshape(1, -1)
-        
-        # Scale features
-        features_scaled = scaler.transform(features)
-        
-        # Get predictions from all models
-        predictions = {}
-        for model_name, model in models.items():
-            pred = model.predict(features_scaled)[0]
-            prob = model.predict_proba(features_scaled)[0][1] if hasattr(model, 'predict_proba') else None
-            predictions[model_name] = {
-                'prediction': int(pred),
-                'probability': float(prob) if prob is not None else None
+        # Validate the payload against the training schema before any model runs
+        current = bundle
+        try:
+            with g.timer.stage('parse'):
+                features = current.schema.parse(request.get_json())
+        except SchemaError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        return predict_features(current, features, request.args.get('voting', DEFAULT_VOTING))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/predict/audio', methods=['POST'])
+def predict_audio():
+    """Extract the voice measurements from an uploaded WAV recording and score them"""
+    try:
+        current = bundle
+        if 'file' not in request.files:
+            return jsonify({'success': False, 'error': 'Upload a WAV recording as "file"'}), 400
+        try:
+            with g.timer.stage('extract'):
+                measurements = extract_bytes(request.files['file'].read())
+            with g.timer.stage('parse'):
+                features = current.schema.parse(measurements)
+        except ValueError as e:
+            # Covers unreadable WAV data, unvoiced recordings and schema errors
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        return predict_features(current, features, request.args.get('voting', DEFAULT_VOTING),
+                                extra={'features': measurements})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+def load_batch_features(schema):
+    """Read batch rows from an uploaded CSV or a JSON array into an array in training column order"""
+    if 'file' not in request.files:
+        payload = request.get_json()
+        rows = payload.get('rows') if isinstance(payload, dict) else payload
+        features = schema.parse_rows(rows)
+        names = [row.get('name') if isinstance(row, dict) else None for row in rows]
+        return features, names if any(name is not None for name in names) else None
+
+    frame = pd.read_csv(request.files['file'])
+    feature_columns = list(schema.feature_columns)
+    missing = [column for column in feature_columns if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+
+    names = frame['name'].astype(str).tolist() if 'name' in frame.columns else None
+    features = frame[feature_columns].to_numpy(dtype=np.float64)
+    return features, names
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    current = bundle
+    try:
+        features, names = load_batch_features(current.schema)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+    try:
+        # Scale all rows at once
+        start = time.perf_counter()
+        features_scaled = current.scaler.transform(features)
+        scale_seconds = time.perf_counter() - start
+
+        # One vectorized probability pass per model for the whole batch
+        with g.timer.stage('inference'):
+            result = current.scorer.score(features_scaled, voting=request.args.get('voting', DEFAULT_VOTING))
+        record_inference('predict_batch', result, len(features), scale_seconds)
+        flagged = check_distribution(current, features)
+
+        results = []
+        for i in range(len(features)):
+            row = {
+                'overall_prediction': int(result.overall[i]),
+                'positive_votes': int(result.positive_votes[i]),
+                'model_predictions': result.model_predictions(i),
+                'models_run': result.models_run(i)
             }
-        
-        # Calculate overall prediction (majority vote)
-        votes = [pred['prediction'] for pred in predictions.values()]
-        overall_prediction = 1 if sum(votes) > len(votes)/2 else 0
-        
+            if result.row_probability(i) is not None:
+                row['ensemble_probability'] = result.row_probability(i)
+            if flagged is not None:
+                row['out_of_distribution'] = flagged[i]
+            if names is not None:
+                row['name'] = names[i]
+            results.append(row)
+
         return jsonify({
             'success': True,
-            'overall_prediction': overall_prediction,
-            'model_predictions': predictions
+            'count': len(results),
+            'predictions': results,
+            'timings_ms': result.timings_ms()
         })
     except Exception as e:
+        logger.error(f"Error in batch prediction: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
-        })
+        }), 500
+
+def is_admin_request():
+    """Admin routes are disabled unless ADMIN_TOKEN is set and the request presents it"""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+
+@app.route('/admin/refresh-metrics', methods=['POST'])
+def refresh_metrics():
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    try:
+        get_model_metrics(refresh=True)
+        return jsonify({'success': True})
+    except Exception as e:
+        logger.error(f"Error refreshing metrics: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def current_pointer_mtime():
+    try:
+        return os.stat(os.path.join(BUNDLE_ROOT, CURRENT_FILE)).st_mtime_ns
+    except OSError:
+        return None
+
+# How often each worker process checks whether CURRENT points at a new bundle
+RELOAD_CHECK_SECONDS = float(os.environ.get('BUNDLE_RELOAD_CHECK_SECONDS', 2))
+_reload_lock = threading.Lock()
+_current_pointer = {'mtime': current_pointer_mtime(), 'checked': time.monotonic()}
+
+def swap_bundle(new_bundle):
+    """Serve a fully loaded bundle for new requests"""
+    global bundle
+    bundle = new_bundle
+    prediction_cache.clear()
+    get_model_metrics()
+    logger.info(f"Now serving model bundle {new_bundle.version}")
+
+@app.before_request
+def follow_current_bundle():
+    """Reload when the CURRENT pointer changes, so every worker process follows /admin/reload"""
+    now = time.monotonic()
+    if now - _current_pointer['checked'] < RELOAD_CHECK_SECONDS or not _reload_lock.acquire(blocking=False):
+        return
+    try:
+        _current_pointer['checked'] = now
+        mtime = current_pointer_mtime()
+        if mtime == _current_pointer['mtime']:
+            return
+        _current_pointer['mtime'] = mtime
+        version = resolve_version()
+        if version is not None and version != bundle.version:
+            swap_bundle(load_serving_bundle(version))
+    except Exception as e:
+        logger.error(f"Error following the current model bundle: {str(e)}")
+    finally:
+        _reload_lock.release()
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_bundle():
+    """Load a bundle version fully, swap it in, and point CURRENT at it for the other workers"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    try:
+        version = (request.get_json(silent=True) or {}).get('version')
+        pinned = os.environ.get('MODEL_BUNDLE_VERSION')
+        if pinned and version is not None and version != pinned:
+            # Other workers keep following the pin, so only this one would switch
+            return jsonify({'success': False,
+                            'error': f"Serving is pinned to {pinned} by MODEL_BUNDLE_VERSION"}), 409
+        with _reload_lock:
+            new_bundle = load_serving_bundle(version)
+            if version is not None and new_bundle.version != 'legacy':
+                set_current_version(new_bundle.version)
+            _current_pointer['mtime'] = current_pointer_mtime()
+            swap_bundle(new_bundle)
+        return jsonify({'success': True, 'version': new_bundle.version})
+    except Exception as e:
+        logger.error(f"Error reloading model bundle: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/admin/artifacts')
+def artifact_stats():
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    current = bundle
+    stats = current.models.stats()
+    stats['scaler'] = current.scaler_stats
+    return jsonify({'success': True, 'version': current.version, 'artifacts': stats})
+
+@app.route('/schema')
+def feature_schema():
+    return jsonify(bundle.schema.describe())
+
+@app.route('/stats')
+def dataset_stats():
+    current = bundle
+    if current.dataset_stats is None:
+        return jsonify({'success': False, 'error': 'Dataset statistics are not available'}), 404
+    return jsonify({
+        'success': True,
+        'rows': current.dataset_stats.n_rows,
+        'features': current.dataset_stats.summary(),
+        'bounds': {
+            column: [float(low), float(high)]
+            for column, low, high in zip(current.distribution.feature_columns,
+                                         current.distribution.low, current.distribution.high)
+        }
+    })
+
+@app.route('/admin/cache')
+def cache_stats():
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    return jsonify({'success': True, 'prediction_cache': prediction_cache.stats()})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    """Serve a content-hashed asset, precompressed when the client accepts it"""
+    if filename not in current_assets()[1]:
+        abort(404)
+    path, encoding = choose_encoding(os.path.join(ASSETS_DIR, filename), request.headers.get('Accept-Encoding', ''))
+    response = send_from_directory(ASSETS_DIR, os.path.basename(path),
+                                   mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                                   max_age=IMMUTABLE_MAX_AGE)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
 
 @app.route('/static/images/<path:filename>')
 def serve_image(filename):
     return send_from_directory('docs/images', filename)
 
+# Warm the metrics cache once per process instead of on page views
+get_model_metrics()
+
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Parkinson's Disease prediction server")
+    parser.add_argument('--refresh-metrics', action='store_true',
+                        help='Recompute the cached model metrics and exit')
+    args = parser.parse_args()
+    if args.refresh_metrics:
+        get_model_metrics(refresh=True)
+    else:
+        app.run(debug=True) 
\ No newline at end of file
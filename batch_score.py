@@ -0,0 +1,155 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from audio_features import extract_directory
+from bundles import ModelBundle
+from ensemble import VOTING_MODES
+from data_loader import NAME_COLUMN
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Bundle loaded once per worker process
+_worker_bundle = None
+
+
+def score_chunk(bundle, chunk, voting='hard'):
+    """Score one chunk in the PDdatasetN.csv layout and return the prediction frame"""
+    missing = [column for column in bundle.feature_columns if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+
+    features = chunk[bundle.feature_columns].to_numpy(dtype=np.float64)
+    result = bundle.scorer.score(bundle.scaler.transform(features), voting=voting)
+
+    output = {}
+    if NAME_COLUMN in chunk.columns:
+        output[NAME_COLUMN] = chunk[NAME_COLUMN].to_numpy()
+    output['overall_prediction'] = result.overall
+    output['positive_votes'] = result.positive_votes
+    if result.ensemble_probability is not None:
+        output['ensemble_probability'] = result.ensemble_probability
+    for model_name, labels in result.labels.items():
+        column = model_name.lower().replace(' ', '_')
+        output[f'{column}_prediction'] = labels
+        if result.probabilities[model_name] is not None:
+            output[f'{column}_probability'] = result.probabilities[model_name]
+    return pd.DataFrame(output, index=chunk.index)
+
+
+def _init_worker(version):
+    global _worker_bundle
+    _worker_bundle = ModelBundle.load(version)
+
+
+def _score_in_worker(chunk, voting):
+    return score_chunk(_worker_bundle, chunk, voting)
+
+
+class PredictionWriter:
+    """Append prediction frames to a CSV or Parquet file as they are produced"""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self._writer = None
+        self._wrote_header = False
+
+    def write(self, frame):
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise RuntimeError("Writing Parquet output requires pyarrow (pip install pyarrow)")
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a' if self._wrote_header else 'w',
+                         header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(input_path, output_path, version=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=0,
+               voting='hard'):
+    """Stream input_path through the ensemble and return (rows, seconds)
+
+    ``input_path`` is a CSV in the PDdatasetN.csv layout or a directory of
+    WAV recordings.
+
+    At most ``2 * workers`` chunks are in flight, so memory stays bounded by the
+    chunk size rather than the input size.
+    """
+    start = time.perf_counter()
+    rows = 0
+    writer = PredictionWriter(output_path)
+    if os.path.isdir(input_path):
+        # A directory of recordings is featurized first; features are cached by audio hash
+        features = extract_directory(input_path, workers=workers or None)
+        chunks = (features.iloc[i:i + chunk_size] for i in range(0, len(features), chunk_size))
+    else:
+        chunks = pd.read_csv(input_path, chunksize=chunk_size)
+    try:
+        if workers > 0:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(version,)) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_score_in_worker, chunk, voting))
+                    if len(pending) >= 2 * workers:
+                        frame = pending.popleft().result()
+                        writer.write(frame)
+                        rows += len(frame)
+                while pending:
+                    frame = pending.popleft().result()
+                    writer.write(frame)
+                    rows += len(frame)
+        else:
+            bundle = ModelBundle.load(version)
+            for chunk in chunks:
+                frame = score_chunk(bundle, chunk, voting)
+                writer.write(frame)
+                rows += len(frame)
+                logger.info(f"Scored {rows} rows ({rows / (time.perf_counter() - start):.0f} rows/s)")
+    finally:
+        writer.close()
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a large recording archive in fixed-size chunks')
+    parser.add_argument('input', help='CSV in the PDdatasetN.csv column layout, or a directory of .wav files')
+    parser.add_argument('output', help='Output .csv or .parquet file')
+    parser.add_argument('--bundle-version', help='Bundle version to score with (default: the current bundle)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Worker processes (default: score in this process)')
+    parser.add_argument('--voting', choices=list(VOTING_MODES), default='hard')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if os.path.abspath(args.input) == os.path.abspath(args.output):
+        sys.exit("Input and output must be different files")
+
+    rows, seconds = score_file(args.input, args.output, version=args.bundle_version,
+                               chunk_size=args.chunk_size, workers=args.workers, voting=args.voting)
+    print(f"Scored {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_dataset
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DATASET = os.path.join(REPO_DIR, 'PDdatasetN.csv')
+SYNTHETIC_CHUNK_ROWS = 1000000
+
+
+def synthesize_dataset(path, n_rows, source=SOURCE_DATASET, seed=42):
+    """Write n_rows synthetic recordings resampled from the source with 1% multiplicative noise
+
+    Rows are generated and written in chunks so 10^7-row files do not need
+    to fit in memory.
+    """
+    dataset = load_dataset(source)
+    rng = np.random.default_rng(seed)
+    columns = pd.read_csv(source, nrows=0).columns
+    written = 0
+    while written < n_rows:
+        size = min(SYNTHETIC_CHUNK_ROWS, n_rows - written)
+        idx = rng.integers(0, len(dataset), size)
+        features = dataset.features[idx] * (1.0 + rng.normal(0.0, 0.01, (size, len(dataset.feature_columns))))
+        frame = pd.DataFrame(features, columns=dataset.feature_columns)
+        frame['name'] = [f'{name}_syn{written + i}' for i, name in enumerate(dataset.names[idx])]
+        frame['status'] = dataset.status[idx].astype(float)
+        frame[list(columns)].to_csv(path, mode='a' if written else 'w', header=not written, index=False)
+        written += size
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        'median_s': statistics.median(samples),
+        'p95_s': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        'min_s': samples[0],
+        'runs': len(samples)
+    }
+
+
+def _run_script(workdir, args, repeat=1):
+    """Time a repository script run as a subprocess inside workdir"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, MPLBACKEND='Agg', LOG_LEVEL='WARNING')
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=workdir, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def bench_training(workdir, dataset_path, train_args):
+    return _run_script(workdir, [os.path.join(REPO_DIR, 'model_comparison.py'),
+                                 '--dataset', dataset_path] + train_args)
+
+
+def bench_visualizations(workdir):
+    return _run_script(workdir, [os.path.join(REPO_DIR, 'generate_visualizations.py'), '--force'])
+
+
+def bench_cold_start(workdir, repeat):
+    return _run_script(workdir, ['-c', 'import app'], repeat=repeat)
+
+
+def bench_batch_score(workdir, dataset_path, rows):
+    stats = _run_script(workdir, [os.path.join(REPO_DIR, 'batch_score.py'), dataset_path,
+                                  os.path.join(workdir, 'scored.csv')])
+    stats['rows_per_s'] = rows / stats['median_s']
+    return stats
+
+
+def bench_predict(workdir, dataset_path, batch_sizes, repeat):
+    """Time /predict and /predict/batch through the Flask test client"""
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import app as app_module
+        client = app_module.app.test_client()
+        frame = pd.read_csv(dataset_path, nrows=max(batch_sizes))
+        columns = app_module.bundle.feature_columns
+        results = {}
+
+        row = frame.loc[0, columns].astype(float).tolist()
+        client.post('/predict', json=row)
+        samples = []
+        for i in range(repeat):
+            # Vary the row so the prediction cache does not serve it
+            payload = [value * (1.0 + 1e-9 * (i + 1)) for value in row]
+            start = time.perf_counter()
+            client.post('/predict', json=payload)
+            samples.append(time.perf_counter() - start)
+        results['predict_single'] = _summary(samples)
+
+        for size in batch_sizes:
+            # The dataset may have fewer rows than the requested batch size
+            n = min(size, len(frame))
+            rows = frame.loc[:n - 1, columns].astype(float).values.tolist()
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                client.post('/predict/batch', json=rows)
+                samples.append(time.perf_counter() - start)
+            stats = _summary(samples)
+            stats['rows_per_s'] = n / stats['median_s']
+            results[f'predict_batch[rows={n}]'] = stats
+        return results
+    finally:
+        os.chdir(cwd)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='pd-bench-') as workdir:
+        for size in args.sizes:
+            dataset_path = os.path.join(workdir, f'synthetic_{size}.csv')
+            synthesize_dataset(dataset_path, size)
+            if size <= args.max_train_rows:
+                print(f"Training on {size} rows...")
+                results[f'train[rows={size}]'] = bench_training(workdir, dataset_path, args.train_args)
+                print(f"Rendering figures for {size} rows...")
+                results[f'visualize[rows={size}]'] = bench_visualizations(workdir)
+            print(f"Batch scoring {size} rows...")
+            results[f'batch_score[rows={size}]'] = bench_batch_score(workdir, dataset_path, size)
+
+        results['cold_start'] = bench_cold_start(workdir, args.repeat_startup)
+        results.update(bench_predict(workdir, dataset_path, args.batch_sizes, args.repeat))
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': args.sizes
+        },
+        'results': results
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print median time ratios against a baseline and return the regressed benchmarks"""
+    regressions = []
+    print(f"{'benchmark':40} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, stats in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:40} {'-':>12} {stats['median_s']:>11.4f}s {'new':>8}")
+            continue
+        ratio = stats['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+        flag = ' REGRESSION' if ratio > 1.0 + threshold else ''
+        print(f"{name:40} {base['median_s']:>11.4f}s {stats['median_s']:>11.4f}s {ratio:>7.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark training, inference, rendering and startup')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Synthetic dataset sizes in rows (10^3 to 10^7)')
+    parser.add_argument('--max-train-rows', type=int, default=100000,
+                        help='Skip training and rendering benchmarks above this size')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=50, help='Repetitions for request latency')
+    parser.add_argument('--repeat-startup', type=int, default=5)
+    parser.add_argument('--train-args', nargs=argparse.REMAINDER, default=[],
+                        help='Extra arguments passed to model_comparison.py (must come last)')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare against a previous results file')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative slowdown reported as a regression')
+    args = parser.parse_args()
+    if min(args.sizes) > args.max_train_rows:
+        parser.error('At least one size must be trained to produce a model bundle to benchmark')
+
+    report = run_suite(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
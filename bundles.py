@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+
+from dataset_stats import DistributionCheck
+from ensemble import EnsembleScorer
+from feature_schema import FeatureSchema
+from metrics_cache import fingerprint_files
+from model_registry import ModelRegistry, load_artifact
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_ROOT = os.environ.get('MODEL_BUNDLE_ROOT', 'artifacts')
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+SCALER_FILE = 'scaler.pkl'
+HOLDOUT_FILE = 'holdout.npz'
+# Manifest entries describing how a bundle was trained, derived and tuned.
+# Bundles derived from another one (compacted, cascade-tuned, calibrated or
+# incrementally updated) carry them forward; each step then overwrites its own.
+PROVENANCE_KEYS = ('best_model', 'training', 'feature_selection', 'split', 'compact_export', 'cascade',
+                   'calibration', 'compacted_from', 'cascade_from', 'calibrated_from', 'parent_version')
+
+
+def _slug(model_name):
+    return re.sub(r'[^a-z0-9]+', '_', model_name.lower()).strip('_')
+
+
+def _model_filename(model_name):
+    return _slug(model_name) + '.pkl'
+
+
+def _write_holdout(path, holdout):
+    """Store held-out labels, row indices and per-model predictions as compact arrays"""
+    arrays = {
+        'y_true': np.asarray(holdout['y_true'], dtype=np.int8),
+        'index': np.asarray(holdout['index'], dtype=np.int64)
+    }
+    models = {}
+    for model_name, (y_pred, y_proba) in holdout['predictions'].items():
+        slug = _slug(model_name)
+        models[model_name] = slug
+        arrays[f'pred__{slug}'] = np.asarray(y_pred, dtype=np.int8)
+        if y_proba is not None:
+            arrays[f'proba__{slug}'] = np.asarray(y_proba, dtype=np.float32)
+    np.savez(path, **arrays)
+    return {'file': HOLDOUT_FILE, 'models': models}
+
+
+def write_bundle(models, scaler, feature_columns, dataset_path, metrics=None, root=BUNDLE_ROOT,
+                 version=None, activate=True, extra=None, holdout=None, input_columns=None):
+    """Write a versioned model bundle and optionally make it the current one
+
+    The bundle is assembled in a temporary directory and renamed into place, so
+    readers never see a partially written version. ``feature_columns`` are
+    the model inputs and ``input_columns`` the full layout clients send, when
+    feature selection made them differ. ``holdout`` holds the
+    held-out ``y_true``, row ``index`` and ``predictions`` as
+    ``{model_name: (y_pred, y_proba)}``, so metrics and figures can be derived
+    later without running the models.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = version or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    final_dir = os.path.join(root, version)
+    if os.path.exists(final_dir):
+        raise FileExistsError(f"Bundle version {version} already exists in {root}")
+
+    tmp_dir = tempfile.mkdtemp(prefix=f".{version}.", dir=root)
+    try:
+        model_files = {}
+        for model_name, model in models.items():
+            model_files[model_name] = _model_filename(model_name)
+            # Uncompressed so the server can memory-map the arrays
+            joblib.dump(model, os.path.join(tmp_dir, model_files[model_name]))
+        joblib.dump(scaler, os.path.join(tmp_dir, SCALER_FILE))
+
+        manifest = {
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'models': model_files,
+            'scaler': SCALER_FILE,
+            'feature_columns': list(feature_columns),
+            'input_columns': list(input_columns if input_columns is not None else feature_columns),
+            'dataset': dataset_path,
+            'dataset_hash': fingerprint_files([dataset_path]),
+            'metrics': metrics
+        }
+        if holdout is not None:
+            manifest['holdout'] = _write_holdout(os.path.join(tmp_dir, HOLDOUT_FILE), holdout)
+        if extra:
+            manifest.update(extra)
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp_dir, final_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Wrote model bundle {version} to {final_dir}")
+    if activate:
+        set_current_version(version, root=root)
+    return version
+
+
+def carried_provenance(manifest, exclude=()):
+    """Provenance entries of a parent manifest to write into a bundle derived from it"""
+    return {key: manifest[key] for key in PROVENANCE_KEYS if key in manifest and key not in exclude}
+
+
+def set_current_version(version, root=BUNDLE_ROOT):
+    """Atomically point CURRENT at an existing bundle version"""
+    if not os.path.exists(os.path.join(root, version, MANIFEST_FILE)):
+        raise FileNotFoundError(f"No bundle {version} in {root}")
+    tmp_path = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+
+def resolve_version(version=None, root=BUNDLE_ROOT):
+    """Return the pinned version, else MODEL_BUNDLE_VERSION, else the CURRENT pointer"""
+    version = version or os.environ.get('MODEL_BUNDLE_VERSION')
+    if version:
+        return version
+    current_path = os.path.join(root, CURRENT_FILE)
+    if not os.path.exists(current_path):
+        return None
+    with open(current_path, 'r') as f:
+        return f.read().strip() or None
+
+
+def list_versions(root=BUNDLE_ROOT):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root)
+                  if os.path.exists(os.path.join(root, name, MANIFEST_FILE)))
+
+
+def read_manifest(version=None, root=BUNDLE_ROOT):
+    """Return a bundle's manifest without loading any of its artifacts"""
+    version = resolve_version(version, root=root)
+    if version is None:
+        raise FileNotFoundError(f"No model bundle version pinned and no {CURRENT_FILE} in {root}")
+    with open(os.path.join(root, version, MANIFEST_FILE), 'r') as f:
+        return json.load(f)
+
+
+class ModelBundle:
+    """Models, fitted scaler, feature order and metrics from one training run"""
+
+    def __init__(self, version, models, scaler, feature_columns, metrics=None, manifest=None,
+                 scaler_stats=None, path=None):
+        self.version = version
+        self.models = models
+        self.scaler = scaler
+        self.feature_columns = list(feature_columns)
+        self.metrics = metrics
+        self.manifest = manifest or {}
+        self.schema = FeatureSchema(self.feature_columns, self.manifest.get('input_columns'))
+        self.scaler_stats = scaler_stats
+        self.path = path
+        self.scorer = EnsembleScorer(models, cascade=self.manifest.get('cascade'),
+                                     calibration=self.manifest.get('calibration'))
+        self.dataset_stats = None
+        self.distribution = None
+
+    def attach_dataset_stats(self, stats):
+        """Use a dataset summary for the dashboard and out-of-distribution checks"""
+        self.dataset_stats = stats
+        self.distribution = DistributionCheck(stats, self.feature_columns)
+
+    @property
+    def dataset_hash(self):
+        return self.manifest.get('dataset_hash')
+
+    def holdout_predictions(self):
+        """Return (y_true, index, {model_name: (y_pred, y_proba)}) stored at training time, or None"""
+        holdout = self.manifest.get('holdout')
+        if holdout is None or self.path is None:
+            return None
+        with np.load(os.path.join(self.path, holdout['file'])) as arrays:
+            predictions = {
+                model_name: (arrays[f'pred__{slug}'],
+                             arrays[f'proba__{slug}'] if f'proba__{slug}' in arrays.files else None)
+                for model_name, slug in holdout['models'].items()
+            }
+            return arrays['y_true'], arrays['index'], predictions
+
+    @classmethod
+    def load(cls, version=None, root=BUNDLE_ROOT, lazy=False):
+        """Load a bundle fully before returning it, so it can be swapped in atomically"""
+        manifest = read_manifest(version, root=root)
+        version = manifest['version']
+        bundle_dir = os.path.join(root, version)
+
+        models = ModelRegistry({name: os.path.join(bundle_dir, filename)
+                                for name, filename in manifest['models'].items()})
+        if not lazy:
+            models.load_all()
+        scaler, scaler_stats = load_artifact(os.path.join(bundle_dir, manifest['scaler']))
+        logger.info(f"Loaded model bundle {version}")
+        return cls(version, models, scaler, manifest['feature_columns'], manifest.get('metrics'),
+                   manifest, scaler_stats, path=bundle_dir)
@@ -0,0 +1,288 @@
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, balanced_accuracy_score, brier_score_loss, f1_score
+from sklearn.model_selection import cross_val_predict
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from bundles import ModelBundle, carried_provenance, write_bundle
+from data_loader import load_dataset
+from ensemble import EnsembleScorer
+from evaluation import classification_metrics
+from model_comparison import model_families
+from splits import load_split, split_params
+
+CACHE_DIR = os.path.join('.cache', 'calibration')
+METHODS = ('auto', 'isotonic', 'platt')
+# Isotonic regression overfits small samples; below this many rows 'auto' uses Platt scaling
+ISOTONIC_MIN_ROWS = 1000
+# Knots per lookup table; serving interpolates between them
+MAX_KNOTS = 64
+THRESHOLD_METRICS = {
+    'accuracy': accuracy_score,
+    'balanced_accuracy': balanced_accuracy_score,
+    'f1': f1_score
+}
+CANDIDATE_THRESHOLDS = np.round(np.linspace(0.05, 0.95, 91), 2)
+# Probabilities are clipped to this distance from 0 and 1 before taking their logit
+LOGIT_EPS = 1e-6
+
+
+def _score_kind(model):
+    """'proba' or 'decision' for the raw score the table maps, or None if the model has neither"""
+    if hasattr(model, 'predict_proba'):
+        return 'proba'
+    if hasattr(model, 'decision_function'):
+        return 'decision'
+    return None
+
+
+def _estimator(name, model, manifest):
+    """Unfitted estimator with the bundle's tuned parameters
+
+    Rebuilt from the model family when training parameters are recorded, so
+    compacted bundles, whose models are not scikit-learn estimators, can
+    still be calibrated.
+    """
+    best_params = manifest.get('training', {}).get(name, {}).get('best_params')
+    if best_params is not None and name in model_families():
+        return clone(model_families()[name][0]).set_params(**best_params)
+    return clone(model)
+
+
+def out_of_fold_scores(name, estimator, kind, X_train, y_train, folds, cache_path):
+    """Raw out-of-fold scores for one model, cached on disk, run in a worker process"""
+    if os.path.exists(cache_path):
+        return name, np.load(cache_path)
+    pipeline = Pipeline([('scaler', MinMaxScaler()), ('model', estimator)])
+    method = 'predict_proba' if kind == 'proba' else 'decision_function'
+    scores = cross_val_predict(pipeline, X_train, y_train, cv=folds, method=method)
+    if kind == 'proba':
+        scores = scores[:, 1]
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    np.save(cache_path, scores.astype(np.float64))
+    return name, scores
+
+
+def _logit(p):
+    p = np.clip(p, LOGIT_EPS, 1 - LOGIT_EPS)
+    return np.log(p / (1 - p))
+
+
+def fit_table(scores, y, method='auto', kind='decision'):
+    """Fit isotonic or Platt calibration and reduce it to at most MAX_KNOTS (x, y) knots
+
+    Platt scaling is a logistic regression on a margin, so probability scores
+    (``kind='proba'``) are fitted on their logit; the knots stay in the score's
+    own units, which is what serving interpolates.
+    """
+    if method == 'auto':
+        method = 'isotonic' if len(scores) >= ISOTONIC_MIN_ROWS else 'platt'
+    grid = np.unique(np.quantile(scores, np.linspace(0, 1, MAX_KNOTS)))
+    if method == 'isotonic':
+        isotonic = IsotonicRegression(out_of_bounds='clip').fit(scores, y)
+        knots = isotonic.X_thresholds_
+        x = knots if len(knots) <= MAX_KNOTS else grid
+        calibrated = isotonic.predict(x)
+    elif method == 'platt':
+        margin = _logit if kind == 'proba' else np.asarray
+        platt = LogisticRegression(C=1e6).fit(margin(scores).reshape(-1, 1), y)
+        x = grid
+        calibrated = platt.predict_proba(margin(x).reshape(-1, 1))[:, 1]
+    else:
+        raise ValueError(f"Unknown calibration method '{method}', expected one of {', '.join(METHODS)}")
+    return method, np.asarray(x, dtype=float), np.asarray(calibrated, dtype=float)
+
+
+def tune_threshold(probabilities, y, metric='balanced_accuracy'):
+    """Decision threshold on calibrated probabilities that maximizes ``metric``
+
+    Calibrated probabilities take few distinct values, so many thresholds tie;
+    the middle of the tied ones is taken rather than the lowest.
+    """
+    score = THRESHOLD_METRICS[metric]
+    results = np.array([score(y, (probabilities >= threshold).astype(int)) for threshold in CANDIDATE_THRESHOLDS])
+    tied = CANDIDATE_THRESHOLDS[np.isclose(results, results.max())]
+    return float(tied[len(tied) // 2])
+
+
+def _table(kind, method, x, y, threshold, scores, y_true):
+    calibrated = np.interp(scores, x, y)
+    return {
+        'score': kind,
+        'method': method,
+        'x': [round(float(v), 6) for v in x],
+        'y': [round(float(v), 6) for v in y],
+        'threshold': threshold,
+        'oof_brier': float(brier_score_loss(y_true, calibrated))
+    }
+
+
+def fit_calibration(oof_scores, kinds, y, method='auto', metric='balanced_accuracy', raw=()):
+    """Per-model and ensemble lookup tables with tuned thresholds from out-of-fold scores
+
+    Models in ``raw`` get no table and enter the ensemble table's fit with
+    their uncalibrated probabilities, as they will be served.
+    """
+    tables = {}
+    calibrated = []
+    for name, scores in oof_scores.items():
+        if name in raw:
+            calibrated.append(scores)
+            continue
+        table_method, x, table_y = fit_table(scores, y, method, kinds[name])
+        probabilities = np.interp(scores, x, table_y)
+        tables[name] = _table(kinds[name], table_method, x, table_y, tune_threshold(probabilities, y, metric),
+                              scores, y)
+        calibrated.append(probabilities)
+
+    # The soft vote averages calibrated probabilities, which is not itself calibrated
+    mean_probability = np.mean(calibrated, axis=0)
+    table_method, x, table_y = fit_table(mean_probability, y, method, 'proba')
+    ensemble = _table('mean', table_method, x, table_y,
+                      tune_threshold(np.interp(mean_probability, x, table_y), y, metric), mean_probability, y)
+    return {'method': method, 'threshold_metric': metric, 'oof_rows': int(len(y)),
+            'models': tables, 'ensemble': ensemble}
+
+
+def _holdout_report(y_true, before, after):
+    """Brier score and accuracy on held-out rows before and after calibration"""
+    report = {}
+    for name in after.labels:
+        if after.probabilities[name] is None:
+            continue
+        raw = before.probabilities[name]
+        report[name] = {
+            'brier_before': float(brier_score_loss(y_true, raw)) if raw is not None else None,
+            'brier_after': float(brier_score_loss(y_true, after.probabilities[name])),
+            'accuracy_before': float(accuracy_score(y_true, before.labels[name])),
+            'accuracy_after': float(accuracy_score(y_true, after.labels[name]))
+        }
+    report['ensemble'] = {
+        'brier_before': float(brier_score_loss(y_true, before.ensemble_probability))
+        if before.ensemble_probability is not None else None,
+        'brier_after': float(brier_score_loss(y_true, after.ensemble_probability)),
+        'accuracy_before': float(accuracy_score(y_true, before.overall)),
+        'accuracy_after': float(accuracy_score(y_true, after.overall))
+    }
+    return report
+
+
+def export_calibrated_bundle(version=None, method='auto', metric='balanced_accuracy', workers=None,
+                             activate=False, cache_dir=CACHE_DIR):
+    """Write a new bundle with calibration tables fitted on out-of-fold training predictions
+
+    Out-of-fold scores come from the bundle's grouped cross-validation folds
+    and are cached per bundle version and model, so refitting tables with
+    another method or metric does not retrain anything. The tables are
+    fitted on training rows only and checked on the bundle's held-out rows;
+    a table that worsens a held-out Brier score is dropped, and that model
+    (or the soft vote) serves its raw probabilities.
+    """
+    bundle = ModelBundle.load(version)
+    holdout = bundle.holdout_predictions()
+    if holdout is None:
+        raise ValueError(f"Bundle {bundle.version} has no held-out predictions; retrain it with model_comparison.py")
+    y_holdout, holdout_index, _ = holdout
+
+    dataset = load_dataset(bundle.manifest['dataset'])
+    split_info = bundle.manifest.get('split')
+    if split_info is None:
+        split = load_split(dataset)
+    else:
+        folds, test_size, seed = split_params(split_info['key'])
+        split = load_split(dataset, folds=folds, test_size=test_size, seed=seed)
+    if np.intersect1d(holdout_index, split.train).size:
+        raise ValueError(f"Held-out rows of bundle {bundle.version} overlap the training split {split.key}; "
+                         f"retrain it with model_comparison.py before calibrating")
+    X = dataset.X[bundle.feature_columns]
+    X_train, y_train = X.iloc[split.train], dataset.y.iloc[split.train].to_numpy()
+    folds = split.cv_folds()
+
+    kinds = {name: _score_kind(model) for name, model in bundle.models.items()}
+    kinds = {name: kind for name, kind in kinds.items() if kind is not None}
+    start = time.perf_counter()
+    oof_scores = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for name, kind in kinds.items():
+            key = hashlib.sha256(f"{bundle.version}:{split.key}:{name}:{kind}".encode()).hexdigest()[:16]
+            futures.append(pool.submit(out_of_fold_scores, name,
+                                       _estimator(name, bundle.models[name], bundle.manifest), kind,
+                                       X_train, y_train, folds, os.path.join(cache_dir, f"{key}.npy")))
+        for future in futures:
+            name, scores = future.result()
+            oof_scores[name] = scores
+    oof_seconds = time.perf_counter() - start
+
+    X_holdout = bundle.scaler.transform(X.iloc[holdout_index])
+    before = EnsembleScorer(bundle.models).score(X_holdout, voting='soft')
+
+    def validate(calibration):
+        after = EnsembleScorer(bundle.models, calibration=calibration).score(X_holdout, voting='soft')
+        return after, _holdout_report(y_holdout, before, after)
+
+    def worse(report):
+        return report['brier_before'] is not None and report['brier_after'] > report['brier_before']
+
+    # Keep a table only where it improves the held-out Brier score; other models serve raw probabilities
+    calibration = fit_calibration(oof_scores, kinds, y_train, method, metric)
+    after, validation = validate(calibration)
+    rejected = [name for name in calibration['models'] if worse(validation[name])]
+    if rejected:
+        calibration = fit_calibration(oof_scores, kinds, y_train, method, metric, raw=rejected)
+        after, validation = validate(calibration)
+    if 'ensemble' in validation and worse(validation['ensemble']):
+        del calibration['ensemble']
+        after, validation = validate(calibration)
+    if not calibration['models'] and 'ensemble' not in calibration:
+        raise ValueError(f"Calibration did not improve any held-out Brier score of bundle {bundle.version}")
+    calibration.update({'rejected': rejected, 'oof_seconds': oof_seconds, 'validation': validation})
+
+    predictions = {name: (after.labels[name], after.probabilities[name]) for name in after.labels}
+    metrics = {name: classification_metrics(y_holdout, y_pred, y_proba)
+               for name, (y_pred, y_proba) in predictions.items()}
+    extra = carried_provenance(bundle.manifest)
+    extra.update({'calibrated_from': bundle.version, 'calibration': calibration})
+    new_version = write_bundle(bundle.models, bundle.scaler, bundle.feature_columns, bundle.manifest['dataset'],
+                               metrics=metrics, activate=activate, extra=extra,
+                               holdout={'y_true': y_holdout, 'index': holdout_index, 'predictions': predictions},
+                               input_columns=bundle.schema.input_columns)
+    return new_version, calibration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate model probabilities and tune decision thresholds offline')
+    parser.add_argument('--bundle-version', help='Bundle to calibrate (default: the current bundle)')
+    parser.add_argument('--method', choices=METHODS, default='auto',
+                        help=f"Calibration method ('auto' uses isotonic from {ISOTONIC_MIN_ROWS} rows, else Platt)")
+    parser.add_argument('--threshold-metric', choices=list(THRESHOLD_METRICS), default='balanced_accuracy',
+                        help='Metric the decision thresholds maximize on out-of-fold predictions')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes computing out-of-fold predictions (default: one per CPU)')
+    parser.add_argument('--activate', action='store_true', help='Make the calibrated bundle current')
+    args = parser.parse_args()
+
+    version, calibration = export_calibrated_bundle(args.bundle_version, args.method, args.threshold_metric,
+                                                    args.workers, args.activate)
+    print(f"Out-of-fold predictions for {calibration['oof_rows']} rows in {calibration['oof_seconds']:.2f}s")
+    tables = dict(calibration['models'], ensemble=calibration.get('ensemble'))
+    for name, report in calibration['validation'].items():
+        table = tables.get(name)
+        setting = f"{table['method']}, threshold {table['threshold']:.2f}" if table else 'uncalibrated'
+        brier_before = 'n/a' if report['brier_before'] is None else f"{report['brier_before']:.4f}"
+        print(f"{name}: {setting}, held-out Brier {brier_before} -> {report['brier_after']:.4f}, "
+              f"accuracy {report['accuracy_before']:.2%} -> {report['accuracy_after']:.2%}")
+    print(f"Saved calibrated bundle {version}")
+
+
+if __name__ == '__main__':
+    main()
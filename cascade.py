@@ -0,0 +1,108 @@
+import argparse
+import time
+
+import numpy as np
+
+from bundles import ModelBundle, carried_provenance, write_bundle
+from compact_models import median_latency
+from data_loader import load_dataset
+from ensemble import NOT_RUN
+
+DEFAULT_CONFIDENCES = (0.99, 0.95, 0.9)
+
+
+def _row_seconds(scorer, X, voting, rows=200):
+    """Median seconds to score one row at a time, as /predict does"""
+    samples = []
+    for i in range(min(rows, len(X))):
+        start = time.perf_counter()
+        scorer.score(X[i:i + 1], voting=voting)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def validate_cascade(scorer, X, order, confidence, costs):
+    """Compare cascade decisions on X with the full ensemble's hard vote"""
+    full = scorer.score(X, voting='hard').overall
+    result = scorer.score_cascade(X, order, confidence)
+    ran = np.array([result.labels[name] != NOT_RUN for name in order])
+    row_cost = np.array([costs[name] for name in order]) @ ran
+    return {
+        'agreement': float(np.mean(result.overall == full)),
+        'disagreements': int(np.sum(result.overall != full)),
+        'mean_models_run': float(ran.sum(axis=0).mean()),
+        'models_run_share': {name: float(share) for name, share in zip(order, ran.mean(axis=1))},
+        'estimated_row_seconds': float(row_cost.mean()),
+        'full_row_seconds': float(sum(costs.values()))
+    }
+
+
+def export_cascade_bundle(version=None, confidences=DEFAULT_CONFIDENCES, min_agreement=1.0, activate=False):
+    """Write a new bundle whose cascade order and confidence are measured on its held-out rows
+
+    Models are ordered by measured single-row latency. The exact cascade
+    (stop only when the vote cannot change) always agrees with the full
+    ensemble; each confidence threshold is kept only if it agrees on at least
+    ``min_agreement`` of the held-out rows, and the cheapest accepted setting
+    is stored.
+    """
+    bundle = ModelBundle.load(version)
+    holdout = bundle.holdout_predictions()
+    if holdout is None:
+        raise ValueError(f"Bundle {bundle.version} has no held-out predictions; retrain it with model_comparison.py")
+    y_true, index, predictions = holdout
+    dataset = load_dataset(bundle.manifest['dataset'])
+    X = bundle.scaler.transform(dataset.X[bundle.feature_columns].iloc[index])
+
+    costs = {name: median_latency(model, X[:1]) for name, model in bundle.models.items()}
+    order = sorted(costs, key=costs.get)
+
+    validation = {}
+    best = None
+    for confidence in (None,) + tuple(confidences):
+        report = validate_cascade(bundle.scorer, X, order, confidence, costs)
+        validation['exact' if confidence is None else str(confidence)] = report
+        if report['agreement'] >= min_agreement and (
+                best is None or report['estimated_row_seconds'] < best[1]['estimated_row_seconds']):
+            best = (confidence, report)
+
+    cascade = {'order': order, 'confidence': best[0], 'costs': costs, 'validation': validation}
+    bundle.scorer.cascade = cascade
+    cascade['row_seconds'] = {'hard': _row_seconds(bundle.scorer, X, 'hard'),
+                              'cascade': _row_seconds(bundle.scorer, X, 'cascade')}
+
+    extra = carried_provenance(bundle.manifest)
+    extra.update({'cascade_from': bundle.version, 'cascade': cascade})
+    new_version = write_bundle(bundle.models, bundle.scaler, bundle.feature_columns, bundle.manifest['dataset'],
+                               metrics=bundle.metrics, activate=activate, extra=extra,
+                               holdout={'y_true': y_true, 'index': index, 'predictions': predictions},
+                               input_columns=bundle.schema.input_columns)
+    return new_version, cascade
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure model costs and tune the cascaded ensemble on held-out rows')
+    parser.add_argument('--bundle-version', help='Bundle to tune (default: the current bundle)')
+    parser.add_argument('--confidences', type=float, nargs='*', default=list(DEFAULT_CONFIDENCES),
+                        help='Early-exit confidence thresholds to try')
+    parser.add_argument('--min-agreement', type=float, default=1.0,
+                        help='Share of held-out rows on which the cascade must match the full ensemble')
+    parser.add_argument('--activate', action='store_true', help='Make the tuned bundle current')
+    args = parser.parse_args()
+
+    version, cascade = export_cascade_bundle(args.bundle_version, tuple(args.confidences),
+                                             args.min_agreement, args.activate)
+    costs = cascade['costs']
+    print('Order: ' + ' -> '.join(f"{name} ({costs[name] * 1000:.2f} ms)" for name in cascade['order']))
+    for setting, report in cascade['validation'].items():
+        print(f"{setting}: agreement {report['agreement']:.2%}, {report['mean_models_run']:.2f} models/row, "
+              f"~{report['estimated_row_seconds'] * 1000:.2f} ms vs {report['full_row_seconds'] * 1000:.2f} ms")
+    confidence = cascade['confidence']
+    setting = 'exact' if confidence is None else f"confidence {confidence}"
+    print(f"Selected {setting}; measured per-row latency "
+          f"{cascade['row_seconds']['hard'] * 1000:.2f} ms -> {cascade['row_seconds']['cascade'] * 1000:.2f} ms")
+    print(f"Saved cascade bundle {version}")
+
+
+if __name__ == '__main__':
+    main()
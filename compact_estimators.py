@@ -0,0 +1,110 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.neighbors import BallTree, KNeighborsClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+
+class CompactForest:
+    """Array-backed decision tree/forest classifier with vectorized NumPy traversal
+
+    All trees are concatenated into flat node arrays. Leaves point to
+    themselves, so every row walks every tree in lock-step for ``max_depth``
+    steps with no per-node Python work.
+    """
+
+    def __init__(self, estimators, classes, feature_importances=None):
+        lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            value = tree.value[:, 0, :]
+            values.append(value / value.sum(axis=1, keepdims=True))
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.left = np.concatenate(lefts).astype(np.int32)
+        self.right = np.concatenate(rights).astype(np.int32)
+        self.feature = np.concatenate(features).astype(np.int32)
+        self.threshold = np.concatenate(thresholds).astype(np.float64)
+        self.value = np.concatenate(values).astype(np.float32)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = max_depth
+        self.classes_ = np.asarray(classes)
+        if feature_importances is not None:
+            self.feature_importances_ = np.asarray(feature_importances)
+
+    @classmethod
+    def from_estimator(cls, model):
+        estimators = model.estimators_ if isinstance(model, RandomForestClassifier) else [model]
+        return cls(estimators, model.classes_, getattr(model, 'feature_importances_', None))
+
+    def predict_proba(self, X):
+        # scikit-learn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=1, dtype=np.float64)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class CompactKNN:
+    """k-nearest-neighbour classifier backed by a prebuilt ball tree
+
+    scikit-learn's ``algorithm='auto'`` falls back to brute force above 15
+    features, so the 22-feature model scans every training row per query.
+    """
+
+    def __init__(self, fit_X, fit_y, classes, n_neighbors, weights, metric='euclidean', metric_params=None):
+        self.tree = BallTree(np.ascontiguousarray(fit_X, dtype=np.float64), metric=metric,
+                             **(metric_params or {}))
+        self.y = np.asarray(fit_y, dtype=np.intp)
+        self.classes_ = np.asarray(classes)
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+
+    @classmethod
+    def from_estimator(cls, model):
+        if callable(model.weights):
+            raise ValueError("Callable KNN weights cannot be exported")
+        return cls(model._fit_X, model._y, model.classes_, model.n_neighbors, model.weights,
+                   metric=model.effective_metric_, metric_params=model.effective_metric_params_)
+
+    def predict_proba(self, X):
+        distances, indices = self.tree.query(np.asarray(X, dtype=np.float64), k=self.n_neighbors)
+        if self.weights == 'distance':
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / distances
+            # Exact matches take all the weight, as in scikit-learn
+            exact = np.isinf(weights)
+            weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(np.float64), weights)
+        else:
+            weights = np.ones_like(distances)
+        proba = np.zeros((len(distances), len(self.classes_)))
+        rows = np.repeat(np.arange(len(distances)), self.n_neighbors)
+        np.add.at(proba, (rows, self.y[indices].ravel()), weights.ravel())
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compact_model(model):
+    """Return the compact equivalent of a model, or None when it has none"""
+    if isinstance(model, (RandomForestClassifier, DecisionTreeClassifier)):
+        return CompactForest.from_estimator(model)
+    if isinstance(model, KNeighborsClassifier):
+        return CompactKNN.from_estimator(model)
+    return None
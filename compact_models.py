@@ -0,0 +1,95 @@
+import argparse
+import io
+import time
+
+import joblib
+import numpy as np
+
+from bundles import ModelBundle, carried_provenance, write_bundle
+# The estimators live in their own module so pickled bundles reference an
+# importable path even when this file runs as __main__
+from compact_estimators import CompactForest, CompactKNN, compact_model
+from data_loader import load_dataset
+
+
+def _serialized_bytes(model):
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell()
+
+
+def median_latency(model, X, repeat=20):
+    """Median seconds for one predict_proba call on X"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_proba(X)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def export_compact_bundle(version=None, tolerance=1e-6, activate=False):
+    """Write a new bundle with compact models that reproduce the originals within tolerance"""
+    bundle = ModelBundle.load(version)
+    dataset = load_dataset(bundle.manifest['dataset'])
+    X = bundle.scaler.transform(dataset.X[bundle.feature_columns])
+
+    models = {}
+    report = {}
+    for name, model in bundle.models.items():
+        compact = compact_model(model)
+        models[name] = model
+        if compact is None:
+            continue
+        max_diff = float(np.abs(compact.predict_proba(X) - model.predict_proba(X)).max())
+        label_agreement = float(np.mean(compact.predict(X) == model.predict(X)))
+        accepted = max_diff <= tolerance
+        report[name] = {
+            'accepted': accepted,
+            'max_probability_diff': max_diff,
+            'label_agreement': label_agreement,
+            'bytes_before': _serialized_bytes(model),
+            'bytes_after': _serialized_bytes(compact),
+            'single_row_seconds_before': median_latency(model, X[:1]),
+            'single_row_seconds_after': median_latency(compact, X[:1]),
+            'full_set_seconds_before': median_latency(model, X, repeat=5),
+            'full_set_seconds_after': median_latency(compact, X, repeat=5)
+        }
+        if accepted:
+            models[name] = compact
+
+    holdout = bundle.holdout_predictions()
+    if holdout is not None:
+        y_true, index, predictions = holdout
+        holdout = {'y_true': y_true, 'index': index, 'predictions': predictions}
+    extra = carried_provenance(bundle.manifest)
+    extra.update({'compacted_from': bundle.version, 'compact_export': report})
+    new_version = write_bundle(models, bundle.scaler, bundle.feature_columns, bundle.manifest['dataset'],
+                               metrics=bundle.metrics, activate=activate, extra=extra, holdout=holdout,
+                               input_columns=bundle.schema.input_columns)
+    return new_version, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export tree and KNN models to compact, faster equivalents')
+    parser.add_argument('--bundle-version', help='Bundle to export (default: the current bundle)')
+    parser.add_argument('--tolerance', type=float, default=1e-6,
+                        help='Largest allowed probability difference from the original model')
+    parser.add_argument('--activate', action='store_true', help='Make the exported bundle current')
+    args = parser.parse_args()
+
+    version, report = export_compact_bundle(args.bundle_version, args.tolerance, args.activate)
+    for name, stats in report.items():
+        status = 'exported' if stats['accepted'] else 'kept original'
+        print(f"{name}: {status}, max |dp| {stats['max_probability_diff']:.2e}, "
+              f"labels agree {stats['label_agreement']:.2%}")
+        print(f"  size {stats['bytes_before'] / 1024:.0f} KiB -> {stats['bytes_after'] / 1024:.0f} KiB, "
+              f"single row {stats['single_row_seconds_before'] * 1000:.2f} ms -> "
+              f"{stats['single_row_seconds_after'] * 1000:.2f} ms, "
+              f"full set {stats['full_set_seconds_before'] * 1000:.1f} ms -> "
+              f"{stats['full_set_seconds_after'] * 1000:.1f} ms")
+    print(f"Saved compact bundle {version}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,159 +1,335 @@
+import argparse
+import base64
+import hashlib
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from PIL import Image
 from pptx import Presentation
 from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN
-from pptx.dml.color import RGBColor
-
-def create_title_slide(prs):
-    title_slide_layout = prs.slide_layouts[0]
-    slide = prs.slides.add_slide(title_slide_layout)
-    title = slide.shapes.title
-    subtitle = slide.placeholders[1]
-    
-    title.text = "Parkinson's Disease Detection\nusing Machine Learning"
-    title.text_frame.paragraphs[0].font.size = Pt(44)
-    title.text_frame.paragraphs[0].font.bold = True
-    
-    subtitle.text = "Machine Learning Project\n" + "Date: " + "2024"
-
-def create_intro_slide(prs):
-    bullet_slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(bullet_slide_layout)
-    shapes = slide.shapes
-    
-    title_shape = shapes.title
-    body_shape = shapes.placeholders[1]
-    
-    title_shape.text = "Introduction"
-    
-    tf = body_shape.text_frame
-    tf.text = "Parkinson's Disease Overview"
-    
-    p = tf.add_paragraph()
-    p.text = "• Progressive neurological disorder"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Affects movement and coordination"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Early detection is crucial for better management"
-    p.level = 1
-
-def create_project_overview(prs):
-    bullet_slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(bullet_slide_layout)
-    shapes = slide.shapes
-    
-    title_shape = shapes.title
-    body_shape = shapes.placeholders[1]
-    
-    title_shape.text = "Project Overview"
-    
-    tf = body_shape.text_frame
-    tf.text = "Project Goals"
-    
-    p = tf.add_paragraph()
-    p.text = "• Develop ML model for Parkinson's detection"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Analyze key features and patterns"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Achieve high accuracy in prediction"
-    p.level = 1
-
-def create_methodology(prs):
-    bullet_slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(bullet_slide_layout)
-    shapes = slide.shapes
-    
-    title_shape = shapes.title
-    body_shape = shapes.placeholders[1]
-    
-    title_shape.text = "Methodology"
-    
-    tf = body_shape.text_frame
-    tf.text = "Project Approach"
-    
-    p = tf.add_paragraph()
-    p.text = "• Data Collection and Preprocessing"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Feature Selection and Engineering"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Model Training and Evaluation"
-    p.level = 1
-
-def create_results(prs):
-    bullet_slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(bullet_slide_layout)
-    shapes = slide.shapes
-    
-    title_shape = shapes.title
-    body_shape = shapes.placeholders[1]
-    
-    title_shape.text = "Results"
-    
-    tf = body_shape.text_frame
-    tf.text = "Key Findings"
-    
-    p = tf.add_paragraph()
-    p.text = "• Model Performance Metrics"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Accuracy and Precision Scores"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Feature Importance Analysis"
-    p.level = 1
-
-def create_conclusion(prs):
-    bullet_slide_layout = prs.slide_layouts[1]
-    slide = prs.slides.add_slide(bullet_slide_layout)
-    shapes = slide.shapes
-    
-    title_shape = shapes.title
-    body_shape = shapes.placeholders[1]
-    
-    title_shape.text = "Conclusion"
-    
-    tf = body_shape.text_frame
-    tf.text = "Summary"
-    
-    p = tf.add_paragraph()
-    p.text = "• Successful implementation of ML model"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Potential for real-world application"
-    p.level = 1
-    
-    p = tf.add_paragraph()
-    p.text = "• Future improvements and research directions"
-    p.level = 1
 
-def main():
+from bundles import read_manifest
+from metrics_cache import METRICS_CACHE_PATH
+
+IMAGES_DIR = os.path.join('docs', 'images')
+FIGURE_CACHE_PATH = os.path.join(IMAGES_DIR, '.figure_cache.json')
+REPORT_CACHE_DIR = os.path.join('.cache', 'report')
+STATE_FILE = 'state.json'
+PPTX_PATH = 'Parkinson_Disease_ML_Presentation.pptx'
+HTML_PATH = os.path.join('docs', 'report.html')
+PDF_PATH = os.path.join('docs', 'report.pdf')
+# Slide images for the PDF, and the width figures are downscaled to for the deck
+SLIDE_SIZE = (13.333, 7.5)
+SLIDE_DPI = 120
+FIGURE_WIDTH = 1600
+METRIC_COLUMNS = [('accuracy', 'Accuracy'), ('precision', 'Precision'), ('recall', 'Recall'),
+                  ('f1Score', 'F1'), ('auc', 'AUC')]
+
+
+def load_report_inputs(version=None):
+    """Return (metrics, manifest) from the model bundle, or the metrics cache for legacy models"""
+    try:
+        manifest = read_manifest(version)
+        return manifest.get('metrics') or {}, manifest
+    except FileNotFoundError:
+        if not os.path.exists(METRICS_CACHE_PATH):
+            raise FileNotFoundError("No model bundle or metrics cache found; train or run app.py --refresh-metrics")
+        with open(METRICS_CACHE_PATH, 'r') as f:
+            return json.load(f).get('metrics') or {}, {}
+
+
+def serving_variant(manifest):
+    """Describe how the reported bundle was derived and how it scores, as served"""
+    derived = [('compacted_from', 'compact models'), ('calibrated_from', 'calibrated'),
+               ('cascade_from', 'cascade-tuned'), ('parent_version', 'incrementally updated')]
+    variant = [f"{label} from {manifest[key]}" for key, label in derived if key in manifest]
+    details = []
+    calibration = manifest.get('calibration')
+    if calibration:
+        methods = sorted({table['method'] for table in calibration['models'].values()})
+        details.append(f"Probabilities calibrated ({', '.join(methods) or 'ensemble only'}) on "
+                       f"{calibration['oof_rows']} out-of-fold predictions, with tuned decision thresholds")
+        ensemble = calibration.get('validation', {}).get('ensemble')
+        if ensemble and ensemble['brier_before'] is not None:
+            details.append(f"Held-out ensemble Brier score {ensemble['brier_before']:.4f} -> "
+                           f"{ensemble['brier_after']:.4f}")
+    cascade = manifest.get('cascade')
+    if cascade:
+        confidence = cascade['confidence']
+        report = cascade['validation']['exact' if confidence is None else str(confidence)]
+        details.append(f"Cascaded voting ({' -> '.join(cascade['order'])}): "
+                       f"{report['mean_models_run']:.2f} models per row, {report['agreement']:.1%} agreement "
+                       f"with the full ensemble")
+    return variant, details
+
+
+def slide_specs(metrics, manifest):
+    """Describe every slide as plain data; a slide is rebuilt only when its spec or figure changes"""
+    ranked = sorted(metrics.items(), key=lambda item: item[1]['accuracy'], reverse=True)
+    best_name, best = ranked[0] if ranked else (None, None)
+    split = manifest.get('split', {})
+    selection = manifest.get('feature_selection')
+    n_features = len(manifest.get('feature_columns', [])) or 22
+
+    methodology = [
+        f"{len(metrics)} model families tuned with cross-validated grid search",
+        "Recordings grouped by subject so no subject is in both training and test data"
+        if split else "Held-out 20% test split",
+        f"{n_features} voice features" + (
+            f", selected from {len(manifest.get('input_columns', []))} by importance and correlation"
+            if selection else ""),
+        "Evaluated on held-out data with accuracy, precision, recall, F1 and ROC AUC"
+    ]
+    if split:
+        methodology.append(f"{split['train_rows']} training and {split['test_rows']} test recordings, "
+                           f"{split['folds']} folds")
+    variant, details = serving_variant(manifest)
+    methodology += details
+    title_bullets = [f"Model bundle {manifest.get('version', 'legacy')}",
+                     f"Trained {manifest['created_at'][:10]}" if 'created_at' in manifest else "Legacy models"]
+    if variant:
+        title_bullets.append(f"Serving {', '.join(variant)}")
+
+    specs = [
+        {'id': 'title', 'title': "Parkinson's Disease Detection\nusing Machine Learning",
+         'bullets': title_bullets},
+        {'id': 'introduction', 'title': 'Introduction',
+         'bullets': ["Parkinson's Disease Overview", "Progressive neurological disorder",
+                     "Affects movement and coordination", "Early detection is crucial for better management"]},
+        {'id': 'overview', 'title': 'Project Overview',
+         'bullets': ["Project Goals", "Develop ML model for Parkinson's detection",
+                     "Analyze key features and patterns", "Achieve high accuracy in prediction"]},
+        {'id': 'methodology', 'title': 'Methodology', 'bullets': methodology},
+        {'id': 'results', 'title': 'Results (calibrated, as served)' if 'calibration' in manifest else 'Results',
+         'table': {'columns': ['Model'] + [label for _, label in METRIC_COLUMNS],
+                   'rows': [[name] + [f"{m[key]:.3f}" if key in m else '-' for key, _ in METRIC_COLUMNS]
+                            for name, m in ranked]}},
+        {'id': 'model_comparison', 'title': 'Model Comparison', 'figure': 'model_comparison'},
+        {'id': 'confusion_matrices', 'title': 'Confusion Matrices', 'figure': 'confusion_matrices'},
+        {'id': 'roc_curves', 'title': 'ROC Curves', 'figure': 'roc_curves'},
+        {'id': 'feature_importance', 'title': 'Feature Importance', 'figure': 'feature_importance'},
+        {'id': 'feature_distributions', 'title': 'Feature Distributions', 'figure': 'feature_distributions'},
+        {'id': 'conclusion', 'title': 'Conclusion',
+         'bullets': ([f"Best model: {best_name} with {best['accuracy']:.1%} held-out accuracy"] if best else [])
+         + ["Potential for real-world application", "Future improvements and research directions"]}
+    ]
+    return specs
+
+
+def _figure_key(figure, figure_cache):
+    """Input key recorded by generate_visualizations.py, else a hash of the rendered file"""
+    path = os.path.join(IMAGES_DIR, f'{figure}.png')
+    if not os.path.exists(path):
+        return None
+    if figure in figure_cache:
+        return f"{figure_cache[figure]}:{os.path.getsize(path)}"
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def slide_key(spec, figure_cache):
+    payload = dict(spec)
+    if spec.get('figure'):
+        payload['figure_key'] = _figure_key(spec['figure'], figure_cache)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _cached(spec, key, suffix, cache_dir):
+    return os.path.join(cache_dir, f"{spec['id']}-{key}{suffix}")
+
+
+def render_slide(spec, key, cache_dir=REPORT_CACHE_DIR):
+    """Render one slide to a PNG page (for the PDF) and a downscaled figure (for the deck), run in a worker"""
+    figure_path = None
+    if spec.get('figure'):
+        source = os.path.join(IMAGES_DIR, f"{spec['figure']}.png")
+        if os.path.exists(source):
+            figure_path = _cached(spec, key, '-figure.png', cache_dir)
+            with Image.open(source) as image:
+                image.thumbnail((FIGURE_WIDTH, FIGURE_WIDTH), Image.LANCZOS)
+                image.convert('RGB').save(figure_path, optimize=True)
+
+    fig = plt.figure(figsize=SLIDE_SIZE)
+    fig.text(0.05, 0.9, spec['title'].replace('\n', ' '), fontsize=28, weight='bold', va='top')
+    if spec.get('bullets'):
+        fig.text(0.07, 0.75, '\n\n'.join(f"• {line}" for line in spec['bullets']), fontsize=18, va='top')
+    if spec.get('table'):
+        ax = fig.add_axes([0.05, 0.08, 0.9, 0.7])
+        ax.axis('off')
+        table = ax.table(cellText=spec['table']['rows'], colLabels=spec['table']['columns'], loc='upper center')
+        table.auto_set_font_size(False)
+        table.set_fontsize(14)
+        table.scale(1, 2)
+    if figure_path is not None:
+        ax = fig.add_axes([0.05, 0.05, 0.9, 0.75])
+        ax.axis('off')
+        with Image.open(figure_path) as image:
+            ax.imshow(image)
+    fig.savefig(_cached(spec, key, '.png', cache_dir), dpi=SLIDE_DPI)
+    plt.close(fig)
+    return spec['id']
+
+
+def build_pptx(specs, keys, path, cache_dir=REPORT_CACHE_DIR):
     prs = Presentation()
-    
-    # Create slides
-    create_title_slide(prs)
-    create_intro_slide(prs)
-    create_project_overview(prs)
-    create_methodology(prs)
-    create_results(prs)
-    create_conclusion(prs)
-    
-    # Save the presentation
-    prs.save('Parkinson_Disease_ML_Presentation.pptx')
-    print("Presentation created successfully!")
+    prs.slide_width, prs.slide_height = Inches(SLIDE_SIZE[0]), Inches(SLIDE_SIZE[1])
+    for spec in specs:
+        if spec['id'] == 'title':
+            slide = prs.slides.add_slide(prs.slide_layouts[0])
+            slide.shapes.title.text = spec['title']
+            slide.shapes.title.text_frame.paragraphs[0].font.size = Pt(44)
+            slide.shapes.title.text_frame.paragraphs[0].font.bold = True
+            slide.placeholders[1].text = '\n'.join(spec['bullets'])
+            continue
+
+        if spec.get('bullets'):
+            slide = prs.slides.add_slide(prs.slide_layouts[1])
+            slide.shapes.title.text = spec['title']
+            tf = slide.placeholders[1].text_frame
+            tf.text = spec['bullets'][0]
+            for line in spec['bullets'][1:]:
+                p = tf.add_paragraph()
+                p.text = line
+                p.level = 1
+            continue
+
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = spec['title']
+        top = Inches(1.5)
+        if spec.get('table'):
+            columns, rows = spec['table']['columns'], spec['table']['rows']
+            shape = slide.shapes.add_table(len(rows) + 1, len(columns), Inches(0.5), top,
+                                           prs.slide_width - Inches(1), Inches(0.4) * (len(rows) + 1))
+            for j, column in enumerate(columns):
+                shape.table.cell(0, j).text = column
+            for i, row in enumerate(rows, start=1):
+                for j, value in enumerate(row):
+                    shape.table.cell(i, j).text = value
+        figure_path = _cached(spec, keys[spec['id']], '-figure.png', cache_dir)
+        if spec.get('figure') and os.path.exists(figure_path):
+            with Image.open(figure_path) as image:
+                aspect = image.width / image.height
+            height = prs.slide_height - top - Inches(0.3)
+            width = min(prs.slide_width - Inches(1), int(height * aspect))
+            slide.shapes.add_picture(figure_path, int((prs.slide_width - width) / 2), top,
+                                     width=width, height=int(width / aspect))
+    prs.save(path)
+
+
+def build_html(specs, keys, path, cache_dir=REPORT_CACHE_DIR):
+    """Write a self-contained HTML summary with the deck's figures embedded"""
+    sections = []
+    for spec in specs:
+        parts = [f"<h2>{html.escape(spec['title'])}</h2>"]
+        if spec.get('bullets'):
+            parts.append('<ul>' + ''.join(f"<li>{html.escape(line)}</li>" for line in spec['bullets']) + '</ul>')
+        if spec.get('table'):
+            header = ''.join(f"<th>{html.escape(column)}</th>" for column in spec['table']['columns'])
+            body = ''.join('<tr>' + ''.join(f"<td>{html.escape(value)}</td>" for value in row) + '</tr>'
+                           for row in spec['table']['rows'])
+            parts.append(f"<table><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>")
+        figure_path = _cached(spec, keys[spec['id']], '-figure.png', cache_dir)
+        if spec.get('figure') and os.path.exists(figure_path):
+            with open(figure_path, 'rb') as f:
+                encoded = base64.b64encode(f.read()).decode('ascii')
+            parts.append(f'<img src="data:image/png;base64,{encoded}" alt="{html.escape(spec["title"])}">')
+        sections.append(f"<section>{''.join(parts)}</section>")
+
+    document = (
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"UTF-8\">"
+        "<title>Parkinson's Disease Detection Report</title><style>"
+        "body{font-family:Roboto,Arial,sans-serif;max-width:1100px;margin:auto;padding:2em;color:#222}"
+        "section{border-bottom:1px solid #ddd;padding:1em 0}img{max-width:100%}"
+        "table{border-collapse:collapse}th,td{border:1px solid #ccc;padding:.4em .8em;text-align:right}"
+        "th:first-child,td:first-child{text-align:left}"
+        "</style></head><body>" + ''.join(sections) + "</body></html>"
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(document)
+
+
+def build_pdf(specs, keys, path, cache_dir=REPORT_CACHE_DIR):
+    pages = [Image.open(_cached(spec, keys[spec['id']], '.png', cache_dir)).convert('RGB') for spec in specs]
+    pages[0].save(path, save_all=True, append_images=pages[1:], resolution=SLIDE_DPI)
+    for page in pages:
+        page.close()
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_report(version=None, pptx_path=PPTX_PATH, html_path=HTML_PATH, pdf_path=PDF_PATH,
+                 workers=None, force=False, cache_dir=REPORT_CACHE_DIR):
+    """Build the deck, HTML and PDF summary, re-rendering only slides whose inputs changed
+
+    Returns the ids of the slides that were re-rendered. When nothing changed
+    and every output exists, nothing is written.
+    """
+    metrics, manifest = load_report_inputs(version)
+    specs = slide_specs(metrics, manifest)
+    figure_cache = _load_json(FIGURE_CACHE_PATH)
+    keys = {spec['id']: slide_key(spec, figure_cache) for spec in specs}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    state_path = os.path.join(cache_dir, STATE_FILE)
+    state = _load_json(state_path)
+    stale = [spec for spec in specs
+             if force or not os.path.exists(_cached(spec, keys[spec['id']], '.png', cache_dir))]
+    outputs = [pptx_path, html_path, pdf_path]
+    if not stale and state == keys and all(os.path.exists(path) for path in outputs):
+        return []
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render_slide, stale, [keys[spec['id']] for spec in stale], [cache_dir] * len(stale)))
+
+    for path in outputs:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    build_pptx(specs, keys, pptx_path, cache_dir)
+    build_html(specs, keys, html_path, cache_dir)
+    build_pdf(specs, keys, pdf_path, cache_dir)
+
+    # Drop renders of slide versions that are no longer current
+    current = {f"{slide_id}-{key}" for slide_id, key in keys.items()}
+    for name in os.listdir(cache_dir):
+        if name != STATE_FILE and name.split('.')[0].replace('-figure', '') not in current:
+            os.remove(os.path.join(cache_dir, name))
+
+    with open(state_path, 'w') as f:
+        json.dump(keys, f, indent=2)
+    return [spec['id'] for spec in stale]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the presentation and HTML/PDF summary from the latest results')
+    parser.add_argument('--bundle-version', help='Bundle to report on (default: the current bundle)')
+    parser.add_argument('--pptx', default=PPTX_PATH)
+    parser.add_argument('--html', default=HTML_PATH)
+    parser.add_argument('--pdf', default=PDF_PATH)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes used to render slides (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Re-render every slide')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rebuilt = build_report(args.bundle_version, args.pptx, args.html, args.pdf, args.workers, args.force)
+    if rebuilt:
+        print(f"Re-rendered {len(rebuilt)} slides ({', '.join(rebuilt)})")
+    print(f"Presentation and summary up to date in {time.perf_counter() - start:.2f}s")
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
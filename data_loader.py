@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from dataset_stats import extend_cached_stats
+from metrics_cache import fingerprint_files
+
+logger = logging.getLogger(__name__)
+
+DATASET_CACHE_DIR = os.path.join('.cache', 'datasets')
+TARGET_COLUMN = 'status'
+NAME_COLUMN = 'name'
+
+
+class Dataset:
+    """Features, labels and recording names of one CSV, backed by read-only .npy memmaps"""
+
+    def __init__(self, features, status, names, feature_columns, source_hash):
+        self.features = features
+        self.status = status
+        self.names = names
+        self.feature_columns = list(feature_columns)
+        self.source_hash = source_hash
+
+    def __len__(self):
+        return len(self.features)
+
+    @property
+    def X(self):
+        # A single float64 block, so pandas wraps the memmap without copying
+        return pd.DataFrame(self.features, columns=self.feature_columns, copy=False)
+
+    @property
+    def y(self):
+        return pd.Series(self.status, name=TARGET_COLUMN)
+
+    def frame(self):
+        """Return a DataFrame with name, features and status, as the plots expect"""
+        data = self.X.copy()
+        if self.names is not None:
+            data.insert(0, NAME_COLUMN, self.names)
+        if self.status is not None:
+            data[TARGET_COLUMN] = self.status
+        return data
+
+
+def _cache_path(path, source_hash, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}-{source_hash[:16]}")
+
+
+def _write_cache(path, cache_path, source_hash, feature_columns, features, status, names):
+    """Write typed .npy files into cache_path, replacing it atomically"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(cache_path))
+    try:
+        np.save(os.path.join(tmp_dir, 'features.npy'), np.ascontiguousarray(features, dtype=np.float64))
+        if status is not None:
+            np.save(os.path.join(tmp_dir, 'status.npy'), np.asarray(status).astype(np.int8))
+        if names is not None:
+            np.save(os.path.join(tmp_dir, 'names.npy'), np.asarray(names, dtype=str))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({'source': path, 'source_hash': source_hash, 'feature_columns': feature_columns}, f)
+        try:
+            os.rename(tmp_dir, cache_path)
+        except OSError:
+            # Another process converted the same file first
+            if not os.path.exists(os.path.join(cache_path, 'meta.json')):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _convert(path, cache_path, source_hash):
+    """Parse the CSV once and write it to the typed cache"""
+    df = pd.read_csv(path)
+    feature_columns = [c for c in df.columns if c not in (TARGET_COLUMN, NAME_COLUMN)]
+    _write_cache(path, cache_path, source_hash, feature_columns,
+                 df[feature_columns].to_numpy(dtype=np.float64),
+                 df[TARGET_COLUMN].to_numpy() if TARGET_COLUMN in df.columns else None,
+                 df[NAME_COLUMN].astype(str).to_numpy() if NAME_COLUMN in df.columns else None)
+    logger.info(f"Converted {path} to typed cache {cache_path}")
+
+
+def load_dataset(path, cache_dir=DATASET_CACHE_DIR):
+    """Load a dataset CSV through a typed binary cache keyed by the CSV's content hash"""
+    source_hash = fingerprint_files([path])
+    cache_path = _cache_path(path, source_hash, cache_dir)
+    if not os.path.exists(os.path.join(cache_path, 'meta.json')):
+        _convert(path, cache_path, source_hash)
+
+    with open(os.path.join(cache_path, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+
+    def _load(filename):
+        file_path = os.path.join(cache_path, filename)
+        return np.load(file_path, mmap_mode='r') if os.path.exists(file_path) else None
+
+    return Dataset(_load('features.npy'), _load('status.npy'), _load('names.npy'),
+                   meta['feature_columns'], source_hash)
+
+
+def append_rows(path, new_rows, cache_dir=DATASET_CACHE_DIR, output_path=None):
+    """Append labeled rows to a dataset CSV and extend its typed cache and summary without re-parsing
+
+    ``new_rows`` is a DataFrame in the same column layout as the CSV. With
+    ``output_path`` the combined rows are written to that file instead and
+    ``path`` is left untouched. Returns the updated Dataset.
+    """
+    existing = load_dataset(path, cache_dir)
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    missing = [column for column in columns if column not in new_rows.columns]
+    if missing:
+        raise ValueError(f"New rows are missing columns: {', '.join(missing)}")
+
+    new_rows = new_rows[columns]
+    target = output_path or path
+    write_path = f"{target}.{os.getpid()}.tmp" if output_path else path
+    if output_path:
+        shutil.copyfile(path, write_path)
+    with open(write_path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    new_rows.to_csv(write_path, mode='a', header=False, index=False)
+    if output_path:
+        os.replace(write_path, output_path)
+
+    source_hash = fingerprint_files([target])
+    features = np.concatenate([existing.features,
+                               new_rows[existing.feature_columns].to_numpy(dtype=np.float64)])
+    status = None
+    if existing.status is not None:
+        status = np.concatenate([existing.status, new_rows[TARGET_COLUMN].to_numpy().astype(np.int8)])
+    names = None
+    if existing.names is not None:
+        names = np.concatenate([existing.names.astype(str), new_rows[NAME_COLUMN].astype(str).to_numpy()])
+    _write_cache(target, _cache_path(target, source_hash, cache_dir), source_hash, existing.feature_columns,
+                 features, status, names)
+    # Fold only the new rows into the dataset summary, if one was computed
+    extend_cached_stats(existing.source_hash, source_hash, features[len(existing):],
+                        None if status is None else status[len(existing):])
+    logger.info(f"Appended {len(new_rows)} rows to {target}")
+    return load_dataset(target, cache_dir)
@@ -0,0 +1,250 @@
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_DIR = os.path.join('.cache', 'stats')
+# Fine bins per feature; quantiles are exact to within one bin width
+SKETCH_BINS = 256
+# Headroom on each side of the initial range, so appended rows rarely land outside the bins
+EDGE_MARGIN = 0.1
+CHUNK_ROWS = 1_000_000
+# Label used for rows without a status column
+UNLABELED = -1
+
+
+class DatasetStats:
+    """Mergeable per-feature summary of a dataset
+
+    Holds row counts, means and sums of squared deviations per class, the
+    overall co-moment matrix (for correlations) and fixed-edge histograms per
+    class with underflow and overflow bins. Histograms double as quantile
+    sketches. Two summaries over the same columns and edges merge exactly, so
+    new rows update the summary without rescanning the old ones.
+    """
+
+    def __init__(self, columns, edges, classes, count, mean, m2, comoment, minimum, maximum, hist):
+        self.columns = list(columns)
+        self.edges = edges
+        self.classes = classes
+        self.count = count
+        self.mean_by_class = mean
+        self.m2_by_class = m2
+        self.comoment = comoment
+        self.minimum = minimum
+        self.maximum = maximum
+        self.hist = hist
+
+    @classmethod
+    def empty(cls, columns, edges):
+        n_features = len(columns)
+        return cls(columns, edges, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                   np.empty((0, n_features)), np.empty((0, n_features)), np.zeros((n_features, n_features)),
+                   np.full(n_features, np.inf), np.full(n_features, -np.inf),
+                   np.empty((0, n_features, edges.shape[1] + 1), dtype=np.int64))
+
+    @classmethod
+    def from_arrays(cls, features, status, columns, edges):
+        """Summarize one block of rows, which must fit in memory"""
+        features = np.asarray(features, dtype=np.float64)
+        labels = np.full(len(features), UNLABELED) if status is None else np.asarray(status, dtype=np.int64)
+        classes = np.unique(labels)
+        n_features = features.shape[1]
+
+        count = np.array([np.sum(labels == c) for c in classes], dtype=np.int64)
+        mean = np.array([features[labels == c].mean(axis=0) for c in classes])
+        m2 = np.array([((features[labels == c] - mean[i]) ** 2).sum(axis=0) for i, c in enumerate(classes)])
+        centered = features - features.mean(axis=0)
+        comoment = centered.T @ centered
+
+        # Bin 0 is underflow and bin len(edges) is overflow
+        hist = np.zeros((len(classes), n_features, edges.shape[1] + 1), dtype=np.int64)
+        for j in range(n_features):
+            bins = np.searchsorted(edges[j], features[:, j], side='right')
+            for i, c in enumerate(classes):
+                hist[i, j] = np.bincount(bins[labels == c], minlength=edges.shape[1] + 1)
+
+        return cls(columns, edges, classes, count, mean, m2, comoment,
+                   features.min(axis=0), features.max(axis=0), hist)
+
+    @property
+    def n_rows(self):
+        return int(self.count.sum())
+
+    def _overall_mean(self):
+        return (self.count[:, None] * self.mean_by_class).sum(axis=0) / self.n_rows
+
+    def merge(self, other):
+        """Return the summary of both datasets combined"""
+        if self.columns != other.columns or not np.array_equal(self.edges, other.edges):
+            raise ValueError("Only summaries over the same columns and histogram edges can be merged")
+        if other.n_rows == 0:
+            return self
+        if self.n_rows == 0:
+            return other
+
+        # Chan et al. pairwise update of the co-moment matrix
+        n_a, n_b = self.n_rows, other.n_rows
+        delta = other._overall_mean() - self._overall_mean()
+        comoment = self.comoment + other.comoment + np.outer(delta, delta) * n_a * n_b / (n_a + n_b)
+
+        classes = np.union1d(self.classes, other.classes)
+        n_features = len(self.columns)
+        count = np.zeros(len(classes), dtype=np.int64)
+        mean = np.zeros((len(classes), n_features))
+        m2 = np.zeros((len(classes), n_features))
+        hist = np.zeros((len(classes),) + self.hist.shape[1:], dtype=np.int64)
+        for source in (self, other):
+            for i, c in enumerate(source.classes):
+                k = np.searchsorted(classes, c)
+                n_old, n_new = count[k], source.count[i]
+                d = source.mean_by_class[i] - mean[k]
+                total = n_old + n_new
+                mean[k] += d * n_new / total
+                m2[k] += source.m2_by_class[i] + d ** 2 * n_old * n_new / total
+                count[k] = total
+                hist[k] += source.hist[i]
+
+        return DatasetStats(self.columns, self.edges, classes, count, mean, m2, comoment,
+                            np.minimum(self.minimum, other.minimum), np.maximum(self.maximum, other.maximum),
+                            hist)
+
+    def update(self, features, status=None):
+        """Return the summary with new rows folded in"""
+        return self.merge(DatasetStats.from_arrays(features, status, self.columns, self.edges))
+
+    @property
+    def mean(self):
+        return self._overall_mean()
+
+    @property
+    def var(self):
+        return np.diag(self.comoment) / max(self.n_rows - 1, 1)
+
+    def correlation(self):
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.comoment / np.outer(std, std)
+
+    def quantiles(self, qs, classes=None):
+        """Estimate quantiles of every feature from the histogram sketch, shape (len(qs), n_features)"""
+        rows = slice(None) if classes is None else np.isin(self.classes, classes)
+        counts = self.hist[rows].sum(axis=0)
+        qs = np.atleast_1d(qs)
+        out = np.empty((len(qs), len(self.columns)))
+        for j in range(len(self.columns)):
+            # Underflow and overflow bins span out to the observed extremes
+            points = np.concatenate([[self.minimum[j]], self.edges[j], [self.maximum[j]]])
+            points = np.maximum.accumulate(np.clip(points, self.minimum[j], self.maximum[j]))
+            cumulative = np.concatenate([[0], np.cumsum(counts[j])]) / max(counts[j].sum(), 1)
+            out[:, j] = np.interp(qs, cumulative, points)
+        return out
+
+    def histogram(self, column, bins=32):
+        """Coarse histogram of one feature for plotting: (edges, {class: counts})"""
+        j = self.columns.index(column)
+        inner = self.hist[:, j, 1:-1]
+        factor = max(1, inner.shape[1] // bins)
+        usable = inner.shape[1] - inner.shape[1] % factor
+        counts = inner[:, :usable].reshape(len(self.classes), -1, factor).sum(axis=2)
+        # Rows outside the sketch range are folded into the outermost bins
+        counts[:, 0] += self.hist[:, j, 0]
+        counts[:, -1] += self.hist[:, j, -1] + inner[:, usable:].sum(axis=1)
+        return self.edges[j, :usable + 1:factor], dict(zip(self.classes.tolist(), counts))
+
+    def summary(self):
+        """Per-feature rows for the dashboard"""
+        q = self.quantiles([0.05, 0.5, 0.95])
+        std = np.sqrt(self.var)
+        return [{
+            'feature': column,
+            'mean': float(self.mean[j]),
+            'std': float(std[j]),
+            'min': float(self.minimum[j]),
+            'p05': float(q[0, j]),
+            'median': float(q[1, j]),
+            'p95': float(q[2, j]),
+            'max': float(self.maximum[j])
+        } for j, column in enumerate(self.columns)]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, columns=np.asarray(self.columns, dtype=str), edges=self.edges, classes=self.classes,
+                 count=self.count, mean=self.mean_by_class, m2=self.m2_by_class, comoment=self.comoment,
+                 minimum=self.minimum, maximum=self.maximum, hist=self.hist)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            return cls(stored['columns'].tolist(), stored['edges'], stored['classes'], stored['count'],
+                       stored['mean'], stored['m2'], stored['comoment'], stored['minimum'],
+                       stored['maximum'], stored['hist'])
+
+
+def sketch_edges(features, bins=SKETCH_BINS, margin=EDGE_MARGIN):
+    """Fixed histogram edges per feature spanning the observed range plus headroom"""
+    low = np.min(features, axis=0)
+    high = np.max(features, axis=0)
+    pad = np.where(high > low, (high - low) * margin, np.maximum(np.abs(low), 1.0) * margin)
+    return np.linspace(low - pad, high + pad, bins + 1, axis=1)
+
+
+def compute_stats(features, status, columns, edges=None, chunk_rows=CHUNK_ROWS):
+    """Summarize a (possibly memory-mapped) feature matrix chunk by chunk"""
+    if edges is None:
+        edges = sketch_edges(features)
+    stats = DatasetStats.empty(columns, edges)
+    for start in range(0, len(features), chunk_rows):
+        stop = start + chunk_rows
+        stats = stats.merge(DatasetStats.from_arrays(
+            features[start:stop], None if status is None else status[start:stop], columns, edges))
+    return stats
+
+
+def stats_path(source_hash, cache_dir=STATS_CACHE_DIR):
+    return os.path.join(cache_dir, f"{source_hash[:16]}.npz")
+
+
+def load_stats(dataset, cache_dir=STATS_CACHE_DIR):
+    """Return the summary of a Dataset, computing it once per dataset version"""
+    path = stats_path(dataset.source_hash, cache_dir)
+    if not os.path.exists(path):
+        compute_stats(dataset.features, dataset.status, dataset.feature_columns).save(path)
+        logger.info(f"Computed dataset statistics {path}")
+    return DatasetStats.load(path)
+
+
+def extend_cached_stats(old_hash, new_hash, features, status, cache_dir=STATS_CACHE_DIR):
+    """Carry a cached summary over to an appended dataset by merging in only the new rows"""
+    old_path = stats_path(old_hash, cache_dir)
+    if not os.path.exists(old_path):
+        return
+    DatasetStats.load(old_path).update(features, status).save(stats_path(new_hash, cache_dir))
+
+
+class DistributionCheck:
+    """Flags feature values outside the central range of the training data
+
+    Bounds come from the quantile sketch once, so checking a batch is two
+    vectorized comparisons.
+    """
+
+    def __init__(self, stats, feature_columns, tail=0.001):
+        index = [stats.columns.index(column) for column in feature_columns]
+        bounds = stats.quantiles([tail, 1 - tail])[:, index]
+        self.feature_columns = list(feature_columns)
+        self.low = bounds[0]
+        self.high = bounds[1]
+
+    def out_of_range(self, features):
+        """Boolean mask of shape (n_rows, n_features)"""
+        return (features < self.low) | (features > self.high)
+
+    def flagged(self, features):
+        """Names of the out-of-range features of each row"""
+        mask = self.out_of_range(features)
+        return [[self.feature_columns[j] for j in np.flatnonzero(row)] for row in mask]
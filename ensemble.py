@@ -0,0 +1,192 @@
+import time
+
+import numpy as np
+
+VOTING_MODES = ('hard', 'soft', 'cascade')
+# Label recorded for models the cascade did not need to run
+NOT_RUN = -1
+# Cascade order used until cascade.py has measured the bundle's models: cheap
+# closed-form models first, instance-based and forest models last
+DEFAULT_CASCADE_ORDER = ('Naive Bayes', 'Logistic Regression', 'Decision Tree', 'Gradient Boosting',
+                         'SVM', 'KNN', 'Random Forest')
+
+
+class EnsembleResult:
+    """Per-model outputs and the combined vote for a batch of scaled rows"""
+
+    def __init__(self, labels, probabilities, timings, overall, positive_votes, ensemble_probability,
+                 calibrated=False):
+        self.labels = labels
+        self.probabilities = probabilities
+        self.timings = timings
+        self.overall = overall
+        self.positive_votes = positive_votes
+        self.ensemble_probability = ensemble_probability
+        self.calibrated = calibrated
+
+    def models_run(self, row):
+        """Names of the models that scored one row"""
+        return [model_name for model_name, labels in self.labels.items() if labels[row] != NOT_RUN]
+
+    def model_predictions(self, row):
+        """Return the per-model prediction dict for one row, in the /predict response format"""
+        return {
+            model_name: {
+                'prediction': int(self.labels[model_name][row]),
+                'probability': float(self.probabilities[model_name][row])
+                if self.probabilities[model_name] is not None else None
+            }
+            for model_name in self.models_run(row)
+        }
+
+    def row_probability(self, row):
+        """Ensemble probability of one row, or None when no model that ran has probabilities"""
+        if self.ensemble_probability is None or np.isnan(self.ensemble_probability[row]):
+            return None
+        return float(self.ensemble_probability[row])
+
+    def timings_ms(self):
+        return {model_name: seconds * 1000.0 for model_name, seconds in self.timings.items()}
+
+
+def _predict(model, features_scaled, table=None):
+    """Return (labels, positive-class probabilities or None) from one inference pass
+
+    With a calibration ``table`` the model's raw score is mapped to a
+    calibrated probability by interpolating the table's knots, and the label
+    comes from the table's tuned threshold.
+    """
+    if table is not None:
+        if table['score'] == 'proba':
+            scores = model.predict_proba(features_scaled)[:, 1]
+        else:
+            scores = model.decision_function(features_scaled)
+        proba = np.interp(scores, table['x'], table['y'])
+        return (proba >= table['threshold']).astype(int), proba
+    if hasattr(model, 'predict_proba'):
+        proba = model.predict_proba(features_scaled)
+        return model.classes_[np.argmax(proba, axis=1)].astype(int), proba[:, 1]
+    return model.predict(features_scaled).astype(int), None
+
+
+def _table(table):
+    """Calibration table from the manifest with its knots as arrays for ``np.interp``"""
+    return dict(table, x=np.asarray(table['x'], dtype=float), y=np.asarray(table['y'], dtype=float))
+
+
+class EnsembleScorer:
+    """Score rows with every model using a single inference pass per model
+
+    Models that expose ``predict_proba`` are called once and their hard label is
+    taken from the arg-max class, so Random Forest and KNN never run twice.
+    Models without probabilities (e.g. an SVC trained without
+    ``probability=True``) fall back to ``predict``.
+
+    ``cascade`` configures the ``'cascade'`` voting mode: ``order`` lists the
+    models cheapest first and ``confidence`` optionally lets rows exit once
+    every model so far agrees with at least that mean probability.
+
+    ``calibration`` holds the lookup tables written by ``calibration.py``.
+    Calibrated models (including an SVC without ``probability=True``, via its
+    decision function) report calibrated probabilities and vote with tuned
+    thresholds; the soft vote maps the mean probability through the
+    ensemble table and compares it with the ensemble threshold.
+    """
+
+    def __init__(self, models, cascade=None, calibration=None):
+        self.models = models
+        self.cascade = cascade or {}
+        self.tables = {}
+        self.ensemble_table = None
+        if calibration:
+            self.tables = {name: _table(table) for name, table in calibration['models'].items()}
+            if calibration.get('ensemble'):
+                self.ensemble_table = _table(calibration['ensemble'])
+
+    def score(self, features_scaled, voting='hard'):
+        if voting not in VOTING_MODES:
+            raise ValueError(f"Unknown voting mode '{voting}', expected one of {', '.join(VOTING_MODES)}")
+        if voting == 'cascade':
+            return self.score_cascade(features_scaled, self.cascade.get('order'), self.cascade.get('confidence'))
+
+        labels = {}
+        probabilities = {}
+        timings = {}
+        for model_name, model in self.models.items():
+            start = time.perf_counter()
+            labels[model_name], probabilities[model_name] = _predict(model, features_scaled,
+                                                                     self.tables.get(model_name))
+            timings[model_name] = time.perf_counter() - start
+
+        positive_votes = np.sum(list(labels.values()), axis=0)
+        available = [p for p in probabilities.values() if p is not None]
+        ensemble_probability = np.mean(available, axis=0) if available else None
+        threshold = 0.5
+        if self.ensemble_table is not None and len(available) == len(labels):
+            ensemble_probability = np.interp(ensemble_probability, self.ensemble_table['x'], self.ensemble_table['y'])
+            threshold = self.ensemble_table['threshold']
+
+        if voting == 'soft' and ensemble_probability is not None:
+            overall = (ensemble_probability >= threshold).astype(int)
+        else:
+            overall = (positive_votes > len(labels) / 2).astype(int)
+
+        return EnsembleResult(labels, probabilities, timings, overall, positive_votes, ensemble_probability,
+                              calibrated=bool(self.tables))
+
+    def score_cascade(self, features_scaled, order=None, confidence=None):
+        """Hard majority vote that stops running models once each row is decided
+
+        Models run in ``order`` (by default ``DEFAULT_CASCADE_ORDER``, then any
+        other models) on the rows still undecided. A row exits when
+        the remaining models can no longer change its majority vote, which
+        gives exactly the full ensemble's hard-vote answer, or, with
+        ``confidence`` set, when every model so far agrees and their mean
+        probability is at least ``confidence`` for that class.
+        """
+        names = list(self.models)
+        order = [name for name in (order or DEFAULT_CASCADE_ORDER) if name in self.models]
+        order += [name for name in names if name not in order]
+        n_rows, n_models = len(features_scaled), len(names)
+
+        labels = {name: np.full(n_rows, NOT_RUN, dtype=int) for name in names}
+        probabilities = {name: None for name in names}
+        timings = {}
+        positive_votes = np.zeros(n_rows, dtype=int)
+        votes = np.zeros(n_rows, dtype=int)
+        probability_sum = np.zeros(n_rows)
+        probability_count = np.zeros(n_rows, dtype=int)
+        overall = np.zeros(n_rows, dtype=int)
+        active = np.arange(n_rows)
+
+        for name in order:
+            if not len(active):
+                break
+            start = time.perf_counter()
+            row_labels, row_proba = _predict(self.models[name], features_scaled[active], self.tables.get(name))
+            timings[name] = time.perf_counter() - start
+
+            labels[name][active] = row_labels
+            positive_votes[active] += row_labels
+            votes[active] += 1
+            if row_proba is not None:
+                probabilities[name] = np.full(n_rows, np.nan)
+                probabilities[name][active] = row_proba
+                probability_sum[active] += row_proba
+                probability_count[active] += 1
+
+            positive, cast = positive_votes[active], votes[active]
+            decided_positive = positive > n_models / 2
+            decided_negative = positive + (n_models - cast) <= n_models / 2
+            if confidence is not None:
+                with np.errstate(invalid='ignore'):
+                    mean_probability = probability_sum[active] / probability_count[active]
+                decided_positive |= (positive == cast) & (mean_probability >= confidence)
+                decided_negative |= (positive == 0) & (mean_probability <= 1 - confidence)
+            overall[active[decided_positive]] = 1
+            active = active[~(decided_positive | decided_negative)]
+
+        with np.errstate(invalid='ignore'):
+            ensemble_probability = probability_sum / probability_count
+        return EnsembleResult(labels, probabilities, timings, overall, positive_votes, ensemble_probability,
+                              calibrated=bool(self.tables))
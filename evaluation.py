@@ -0,0 +1,35 @@
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix, roc_auc_score
+
+
+def classification_metrics(y_true, y_pred, y_proba=None):
+    """Return the dashboard metrics for one model's held-out predictions"""
+    accuracy = accuracy_score(y_true, y_pred)
+    precision = precision_score(y_true, y_pred)
+    recall = recall_score(y_true, y_pred)
+    f1 = f1_score(y_true, y_pred)
+
+    # Calculate confusion matrix
+    cm = confusion_matrix(y_true, y_pred, labels=[0, 1])
+    tn, fp, fn, tp = cm.ravel()
+
+    # Calculate additional metrics
+    specificity = tn / (tn + fp) if (tn + fp) else 0.0  # True Negative Rate
+    sensitivity = tp / (tp + fn) if (tp + fn) else 0.0  # True Positive Rate
+
+    metrics = {
+        'accuracy': float(accuracy),
+        'precision': float(precision),
+        'recall': float(recall),
+        'f1Score': float(f1),
+        'specificity': float(specificity),
+        'sensitivity': float(sensitivity),
+        'confusion_matrix': {
+            'true_negative': int(tn),
+            'false_positive': int(fp),
+            'false_negative': int(fn),
+            'true_positive': int(tp)
+        }
+    }
+    if y_proba is not None:
+        metrics['auc'] = float(roc_auc_score(y_true, y_proba))
+    return metrics
@@ -0,0 +1,127 @@
+import math
+import re
+
+import numpy as np
+
+# Fields allowed in a named payload besides the features themselves
+IGNORED_FIELDS = ('name',)
+# Input names the dashboard form (templates/index.html) posts for each training column
+FORM_ALIASES = {
+    'mdvp_fo': 'MDVP:Fo(Hz)', 'mdvp_fhi': 'MDVP:Fhi(Hz)', 'mdvp_flo': 'MDVP:Flo(Hz)',
+    'mdvp_jitter': 'MDVP:Jitter(%)', 'mdvp_jitter_abs': 'MDVP:Jitter(Abs)', 'mdvp_rap': 'MDVP:RAP',
+    'mdvp_ppq': 'MDVP:PPQ', 'mdvp_ddp': 'Jitter:DDP', 'mdvp_shimmer': 'MDVP:Shimmer',
+    'mdvp_shimmer_db': 'MDVP:Shimmer(dB)', 'mdvp_shimmer_apq3': 'Shimmer:APQ3',
+    'mdvp_shimmer_apq5': 'Shimmer:APQ5', 'mdvp_apq': 'MDVP:APQ', 'mdvp_dda': 'Shimmer:DDA',
+    'nhr': 'NHR', 'hnr': 'HNR', 'rpde': 'RPDE', 'dfa': 'DFA', 'spread1': 'spread1',
+    'spread2': 'spread2', 'd2': 'D2', 'ppe': 'PPE'
+}
+FORM_INPUT_PATTERN = re.compile(r'<input\b[^>]*\bname="([^"]+)"')
+
+
+class SchemaError(ValueError):
+    """Raised when a payload does not match the training feature schema"""
+
+
+def _to_float(field, value):
+    if isinstance(value, bool) or value is None:
+        raise SchemaError(f"Feature '{field}' must be a number, got {value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise SchemaError(f"Feature '{field}' must be a number, got {value!r}")
+    if not math.isfinite(number):
+        raise SchemaError(f"Feature '{field}' must be finite, got {value!r}")
+    return number
+
+
+class FeatureSchema:
+    """Training feature order compiled into a name-to-column lookup
+
+    Payloads are written straight into a preallocated C-contiguous float64
+    array in training order. Both named objects (``{"MDVP:Fo(Hz)": ...}``) and
+    positional arrays (``[119.99, 157.30, ...]``) are accepted.
+
+    ``input_columns`` is the full recording layout clients send. When feature
+    selection dropped some of its columns, those are accepted and ignored, and
+    positional arrays may use either the full layout or the selected columns.
+    Named payloads may also use the dashboard form's input names (``mdvp_fo``).
+    """
+
+    def __init__(self, feature_columns, input_columns=None):
+        self.feature_columns = tuple(feature_columns)
+        self.input_columns = tuple(input_columns or feature_columns)
+        self.index = {name: i for i, name in enumerate(self.feature_columns)}
+        self.n_features = len(self.feature_columns)
+        self.n_inputs = len(self.input_columns)
+        self._input_positions = [self.input_columns.index(name) for name in self.feature_columns]
+        self.aliases = {alias: name for alias, name in FORM_ALIASES.items() if name in self.input_columns}
+        self._known = set(self.input_columns) | set(self.aliases) | set(IGNORED_FIELDS)
+
+    def _fill_named(self, row, out):
+        if any(key in self.aliases for key in row):
+            row = {self.aliases.get(key, key): value for key, value in row.items()}
+        unknown = [key for key in row if key not in self._known]
+        if unknown:
+            raise SchemaError(f"Unknown features: {', '.join(map(str, unknown))}")
+        missing = [name for name in self.feature_columns if name not in row]
+        if missing:
+            raise SchemaError(f"Missing features: {', '.join(missing)}")
+        for name, i in self.index.items():
+            out[i] = _to_float(name, row[name])
+
+    def _fill_positional(self, row, out):
+        if len(row) == self.n_inputs:
+            positions = self._input_positions
+        elif len(row) == self.n_features:
+            positions = range(self.n_features)
+        else:
+            raise SchemaError(f"Expected {self.n_inputs} feature values, got {len(row)}")
+        for i, position in enumerate(positions):
+            out[i] = _to_float(self.feature_columns[i], row[position])
+
+    def _fill(self, row, out):
+        if isinstance(row, dict):
+            self._fill_named(row, out)
+        elif isinstance(row, (list, tuple)):
+            self._fill_positional(row, out)
+        else:
+            raise SchemaError("Each row must be a JSON object of named features or an array of values")
+
+    def parse(self, payload):
+        """Validate one row and return it as a (1, n_features) float64 array"""
+        if isinstance(payload, dict) and 'features' in payload:
+            payload = payload['features']
+        out = np.empty((1, self.n_features), dtype=np.float64)
+        self._fill(payload, out[0])
+        return out
+
+    def parse_rows(self, rows):
+        """Validate many rows and return them as an (n_rows, n_features) float64 array"""
+        if not isinstance(rows, list) or not rows:
+            raise SchemaError("Expected a non-empty JSON array of rows")
+        out = np.empty((len(rows), self.n_features), dtype=np.float64)
+        for i, row in enumerate(rows):
+            try:
+                self._fill(row, out[i])
+            except SchemaError as e:
+                raise SchemaError(f"Row {i}: {str(e)}")
+        return out
+
+    def check_form(self, template_path):
+        """Raise SchemaError unless the form in ``template_path`` posts exactly the input columns"""
+        with open(template_path, 'r', encoding='utf-8') as f:
+            fields = FORM_INPUT_PATTERN.findall(f.read())
+        unknown = [field for field in fields if field not in self._known]
+        posted = {self.aliases.get(field, field) for field in fields}
+        missing = [name for name in self.input_columns if name not in posted]
+        if unknown or missing:
+            raise SchemaError(f"Form {template_path} does not match the feature schema "
+                              f"(unknown: {', '.join(unknown) or 'none'}; missing: {', '.join(missing) or 'none'})")
+
+    def describe(self):
+        return {
+            'features': list(self.feature_columns),
+            'n_features': self.n_features,
+            'input_columns': list(self.input_columns),
+            'form_aliases': self.aliases
+        }
@@ -0,0 +1,64 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+
+
+def _cv_accuracy(X, y, columns, cv, n_jobs):
+    estimator = RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=n_jobs)
+    return float(cross_val_score(estimator, X[columns], y, cv=cv, scoring='accuracy').mean())
+
+
+def select_features(X, y, corr_threshold=0.95, tolerance=0.005, folds=5, n_jobs=1):
+    """Rank and prune redundant features, keeping CV accuracy within tolerance
+
+    Features are ranked by Random Forest importance. For every pair whose
+    absolute correlation exceeds ``corr_threshold`` (e.g. MDVP:RAP and
+    Jitter:DDP) the less important one is dropped. The least important
+    remaining features are then removed one at a time for as long as
+    cross-validated accuracy stays within ``tolerance`` of the full feature set.
+
+    ``folds`` is a fold count or precomputed (train, test) index pairs.
+    Returns the selected column names, in their original order, and a report.
+    """
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42) if isinstance(folds, int) else folds
+    columns = list(X.columns)
+
+    forest = RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=n_jobs).fit(X, y)
+    importance = dict(zip(columns, forest.feature_importances_))
+    baseline = _cv_accuracy(X, y, columns, cv, n_jobs)
+
+    # Drop the less important feature of each highly correlated pair
+    corr = np.abs(np.corrcoef(X.to_numpy(), rowvar=False))
+    dropped = {}
+    by_importance = sorted(columns, key=importance.get, reverse=True)
+    kept = []
+    for column in by_importance:
+        i = columns.index(column)
+        partner = next((other for other in kept if corr[i, columns.index(other)] > corr_threshold), None)
+        if partner is None:
+            kept.append(column)
+        else:
+            dropped[column] = f"correlated with {partner} (|r| = {corr[i, columns.index(partner)]:.3f})"
+
+    accuracy = _cv_accuracy(X, y, kept, cv, n_jobs)
+    if accuracy < baseline - tolerance:
+        # Correlation pruning alone cost too much accuracy; keep everything
+        kept, dropped, accuracy = list(by_importance), {}, baseline
+
+    # Greedy backward elimination of the least important features
+    while len(kept) > 1:
+        candidate = kept[:-1]
+        candidate_accuracy = _cv_accuracy(X, y, candidate, cv, n_jobs)
+        if candidate_accuracy < baseline - tolerance:
+            break
+        dropped[kept[-1]] = f"low importance ({importance[kept[-1]]:.4f})"
+        kept, accuracy = candidate, candidate_accuracy
+
+    selected = [column for column in columns if column in kept]
+    report = {
+        'baseline_cv_accuracy': baseline,
+        'selected_cv_accuracy': accuracy,
+        'importance': {column: float(value) for column, value in importance.items()},
+        'dropped': dropped
+    }
+    return selected, report
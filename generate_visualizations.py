@@ -3,38 +3,76 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.metrics import confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
-import joblib
+import argparse
+import io
+import json
+import math
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from bundles import ModelBundle
+from data_loader import load_dataset
+from dataset_stats import load_stats
+from splits import load_split
+from static_assets import build_assets
+
+IMAGES_DIR = 'docs/images'
+PRINT_DPI = 300
+WEB_DPI = 96
+WEBP_QUALITY = 80
+RENDITIONS = ('png', 'webp', 'svg')
+FIGURE_CACHE_PATH = os.path.join(IMAGES_DIR, '.figure_cache.json')
 
 # Create docs/images directory if it doesn't exist
-os.makedirs('docs/images', exist_ok=True)
+os.makedirs(IMAGES_DIR, exist_ok=True)
 
 # Set style for all plots
 plt.style.use('default')
 sns.set_theme()
 
-def plot_confusion_matrices(models, X_test, y_test):
+def save_figure(name):
+    """Save the current figure as a 300 dpi print PNG plus web-sized WebP and SVG renditions"""
+    path = os.path.join(IMAGES_DIR, name)
+    plt.savefig(f'{path}.png', dpi=PRINT_DPI, bbox_inches='tight')
+    plt.savefig(f'{path}.svg', bbox_inches='tight')
+    # Pillow ships with matplotlib; going through it avoids needing WebP support in savefig
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png', dpi=WEB_DPI, bbox_inches='tight')
+    buffer.seek(0)
+    Image.open(buffer).save(f'{path}.webp', quality=WEBP_QUALITY, method=6)
+    plt.close()
+
+def compute_predictions(bundle, X_test):
+    """Run each model once on the test set and return {name: (y_pred, y_proba)}"""
+    result = bundle.scorer.score(X_test)
+    return {name: (result.labels[name], result.probabilities[name]) for name in result.labels}
+
+def plot_confusion_matrices(predictions, y_test):
     """Generate confusion matrices for all models"""
-    fig, axes = plt.subplots(2, 3, figsize=(15, 10))
+    n_rows = math.ceil(len(predictions) / 3)
+    fig, axes = plt.subplots(n_rows, 3, figsize=(15, 5 * n_rows), squeeze=False)
     axes = axes.ravel()
-    
-    for idx, (model_name, model) in enumerate(models.items()):
-        y_pred = model.predict(X_test)
+    for ax in axes[len(predictions):]:
+        ax.axis('off')
+
+    y_test_int = y_test.astype(int)
+    for idx, (model_name, (y_pred, _)) in enumerate(predictions.items()):
         # Convert predictions to int type
         y_pred = y_pred.astype(int)
-        y_test_int = y_test.astype(int)
         cm = confusion_matrix(y_test_int, y_pred)
-        
+
         sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=axes[idx])
         axes[idx].set_title(f'{model_name} Confusion Matrix')
         axes[idx].set_xlabel('Predicted')
         axes[idx].set_ylabel('Actual')
-    
+
     plt.tight_layout()
-    plt.savefig('docs/images/confusion_matrices.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_figure('confusion_matrices')
 
-def plot_model_comparison(models, X_test, y_test):
+def plot_model_comparison(predictions, y_test):
     """Generate comparison of model metrics"""
     metrics = {
         'Model': [],
@@ -43,77 +81,76 @@ def plot_model_comparison(models, X_test, y_test):
         'Recall': [],
         'F1-Score': []
     }
-    
+
     y_test_int = y_test.astype(int)
-    
-    for model_name, model in models.items():
-        y_pred = model.predict(X_test)
+
+    for model_name, (y_pred, _) in predictions.items():
         y_pred = y_pred.astype(int)
         metrics['Model'].append(model_name)
         metrics['Accuracy'].append(accuracy_score(y_test_int, y_pred))
         metrics['Precision'].append(precision_score(y_test_int, y_pred))
         metrics['Recall'].append(recall_score(y_test_int, y_pred))
         metrics['F1-Score'].append(f1_score(y_test_int, y_pred))
-    
+
     df_metrics = pd.DataFrame(metrics)
-    
+
     # Plot metrics comparison
     plt.figure(figsize=(12, 6))
     x = np.arange(len(df_metrics['Model']))
     width = 0.2
-    
+
     plt.bar(x - 1.5*width, df_metrics['Accuracy'], width, label='Accuracy')
     plt.bar(x - 0.5*width, df_metrics['Precision'], width, label='Precision')
     plt.bar(x + 0.5*width, df_metrics['Recall'], width, label='Recall')
     plt.bar(x + 1.5*width, df_metrics['F1-Score'], width, label='F1-Score')
-    
+
     plt.xlabel('Models')
     plt.ylabel('Score')
     plt.title('Model Performance Comparison')
     plt.xticks(x, df_metrics['Model'], rotation=45)
     plt.legend()
     plt.tight_layout()
-    plt.savefig('docs/images/model_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_figure('model_comparison')
 
-def plot_feature_importance(models, feature_names):
+def plot_feature_importance(importances_by_model, feature_names):
     """Generate feature importance plots for tree-based models"""
-    tree_models = {name: model for name, model in models.items() 
-                  if name in ['Random Forest', 'Decision Tree']}
-    
-    fig, axes = plt.subplots(1, len(tree_models), figsize=(15, 5))
-    if len(tree_models) == 1:
+    if not importances_by_model:
+        # Still write the figure, so it is cached as up to date instead of re-rendered every run
+        plt.figure(figsize=(15, 5))
+        plt.text(0.5, 0.5, 'No tree-based models in this bundle', ha='center', va='center', fontsize=16)
+        plt.axis('off')
+        save_figure('feature_importance')
+        return
+
+    fig, axes = plt.subplots(1, len(importances_by_model), figsize=(15, 5))
+    if len(importances_by_model) == 1:
         axes = [axes]
-    
-    for idx, (model_name, model) in enumerate(tree_models.items()):
-        if hasattr(model, 'feature_importances_'):
-            importances = model.feature_importances_
-            indices = np.argsort(importances)[::-1]
-            
-            axes[idx].bar(range(len(importances)), importances[indices])
-            axes[idx].set_title(f'{model_name} Feature Importance')
-            axes[idx].set_xticks(range(len(importances)))
-            axes[idx].set_xticklabels([feature_names[i] for i in indices], rotation=90)
-    
+
+    for idx, (model_name, importances) in enumerate(importances_by_model.items()):
+        indices = np.argsort(importances)[::-1]
+
+        axes[idx].bar(range(len(importances)), importances[indices])
+        axes[idx].set_title(f'{model_name} Feature Importance')
+        axes[idx].set_xticks(range(len(importances)))
+        axes[idx].set_xticklabels([feature_names[i] for i in indices], rotation=90)
+
     plt.tight_layout()
-    plt.savefig('docs/images/feature_importance.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_figure('feature_importance')
 
-def plot_roc_curves(models, X_test, y_test):
+def plot_roc_curves(predictions, y_test):
     """Generate ROC curves for all models"""
     from sklearn.metrics import roc_curve, auc
-    
+
     plt.figure(figsize=(10, 8))
     y_test_int = y_test.astype(int)
-    
-    for model_name, model in models.items():
-        if hasattr(model, 'predict_proba'):
-            y_pred_proba = model.predict_proba(X_test)[:, 1]
+
+    for model_name, (_, y_pred_proba) in predictions.items():
+        if y_pred_proba is not None:
             fpr, tpr, _ = roc_curve(y_test_int, y_pred_proba)
             roc_auc = auc(fpr, tpr)
-            
+
             plt.plot(fpr, tpr, label=f'{model_name} (AUC = {roc_auc:.2f})')
-    
+
     plt.plot([0, 1], [0, 1], 'k--')
     plt.xlim([0.0, 1.0])
     plt.ylim([0.0, 1.05])
@@ -121,74 +158,151 @@ def plot_roc_curves(models, X_test, y_test):
     plt.ylabel('True Positive Rate')
     plt.title('ROC Curves for All Models')
     plt.legend(loc="lower right")
-    plt.savefig('docs/images/roc_curves.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_figure('roc_curves')
 
-def plot_data_distribution(data):
-    """Generate distribution plots for features"""
+def plot_data_distribution(stats):
+    """Generate distribution plots for features from the precomputed dataset summary"""
     plt.figure(figsize=(15, 10))
-    
+
     # Plot feature distributions
-    for i, feature in enumerate(data.columns[:6]):  # Plot first 6 features
-        if feature not in ['status', 'name']:
-            plt.subplot(2, 3, i+1)
-            sns.histplot(data=data, x=feature, hue='status', kde=True)
-            plt.title(f'{feature} Distribution')
-    
+    for i, feature in enumerate(stats.columns[:6]):  # Plot first 6 features
+        plt.subplot(2, 3, i+1)
+        edges, counts = stats.histogram(feature)
+        for status, class_counts in counts.items():
+            plt.stairs(class_counts, edges, fill=True, alpha=0.5, label=f'status {status}')
+        plt.xlabel(feature)
+        plt.ylabel('Count')
+        plt.legend()
+        plt.title(f'{feature} Distribution')
+
     plt.tight_layout()
-    plt.savefig('docs/images/feature_distributions.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_figure('feature_distributions')
 
-def plot_correlation_matrix(data):
-    """Generate correlation matrix heatmap"""
-    # Select only numeric columns
-    numeric_cols = data.select_dtypes(include=[np.number]).columns
-    data_numeric = data[numeric_cols]
-    
+def plot_correlation_matrix(stats):
+    """Generate correlation matrix heatmap from the precomputed dataset summary"""
     plt.figure(figsize=(12, 10))
-    correlation_matrix = data_numeric.corr()
+    correlation_matrix = pd.DataFrame(stats.correlation(), index=stats.columns, columns=stats.columns)
     sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', center=0)
     plt.title('Feature Correlation Matrix')
     plt.tight_layout()
-    plt.savefig('docs/images/correlation_matrix.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_figure('correlation_matrix')
 
-def main():
-    # Load models
-    models = {
-        'Random Forest': joblib.load('rf_clf.pkl'),
-        'SVM': joblib.load('svm_clf.pkl'),
-        'KNN': joblib.load('knn_clf.pkl'),
-        'Decision Tree': joblib.load('dt_clf.pkl'),
-        'Naive Bayes': joblib.load('nb_clf.pkl'),
-        'Logistic Regression': joblib.load('lg_clf.pkl')
+# Output file, whether the figure depends on the models or only on the data, and its renderer
+FIGURES = {
+    'confusion_matrices': ('confusion_matrices.png', 'model', plot_confusion_matrices),
+    'model_comparison': ('model_comparison.png', 'model', plot_model_comparison),
+    'feature_importance': ('feature_importance.png', 'model', plot_feature_importance),
+    'roc_curves': ('roc_curves.png', 'model', plot_roc_curves),
+    'feature_distributions': ('feature_distributions.png', 'data', plot_data_distribution),
+    'correlation_matrix': ('correlation_matrix.png', 'data', plot_correlation_matrix)
+}
+
+def load_figure_cache():
+    if not os.path.exists(FIGURE_CACHE_PATH):
+        return {}
+    try:
+        with open(FIGURE_CACHE_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_figure_cache(cache):
+    tmp_path = f"{FIGURE_CACHE_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, FIGURE_CACHE_PATH)
+
+def figure_input_keys(bundle, dataset):
+    """Return the input key each kind of figure depends on"""
+    return {
+        'model': f"{bundle.version}:{bundle.dataset_hash}:{dataset.source_hash}",
+        'data': dataset.source_hash
     }
-    
-    # Load and prepare data
-    data = pd.read_csv('data.csv')
-    X = data.drop(['status', 'name'], axis=1)
-    y = data['status']
-    
-    # Split data
-    from sklearn.model_selection import train_test_split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Scale the features
-    from sklearn.preprocessing import StandardScaler
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
-    # Convert to DataFrame to preserve column names
-    X_test_scaled = pd.DataFrame(X_test_scaled, columns=X.columns)
-    
-    # Generate all visualizations
-    plot_confusion_matrices(models, X_test_scaled, y_test)
-    plot_model_comparison(models, X_test_scaled, y_test)
-    plot_feature_importance(models, X.columns)
-    plot_roc_curves(models, X_test_scaled, y_test)
-    plot_data_distribution(data)
-    plot_correlation_matrix(data)
+
+def stale_figures(input_keys, force=False):
+    """Return the figures whose output is missing or whose inputs have changed"""
+    cache = load_figure_cache()
+    stale = []
+    for figure, (filename, depends_on, _) in FIGURES.items():
+        stem = os.path.join(IMAGES_DIR, os.path.splitext(filename)[0])
+        missing = any(not os.path.exists(f'{stem}.{ext}') for ext in RENDITIONS)
+        if force or missing or cache.get(figure) != input_keys[depends_on]:
+            stale.append(figure)
+    return stale
+
+def _render(figure, args):
+    start = time.perf_counter()
+    FIGURES[figure][2](*args)
+    return figure, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate model performance figures from a model bundle')
+    parser.add_argument('--bundle-version', help='Bundle version to plot (default: the current bundle)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes used to render figures (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Re-render every figure')
+    args = parser.parse_args()
+
+    # Load the models together with the scaler they were trained with
+    bundle = ModelBundle.load(args.bundle_version, lazy=True)
+    dataset = load_dataset(bundle.manifest['dataset'])
+    input_keys = figure_input_keys(bundle, dataset)
+
+    stale = stale_figures(input_keys, force=args.force)
+    if not stale:
+        print("All figures are up to date")
+        return
+
+    feature_columns = bundle.feature_columns
+    jobs = {}
+    if 'feature_distributions' in stale or 'correlation_matrix' in stale:
+        # Data figures render from the stored summary instead of the raw rows
+        stats = load_stats(dataset)
+        if 'feature_distributions' in stale:
+            jobs['feature_distributions'] = (stats,)
+        if 'correlation_matrix' in stale:
+            jobs['correlation_matrix'] = (stats,)
+
+    if any(FIGURES[figure][1] == 'model' for figure in stale):
+        holdout = bundle.holdout_predictions()
+        if holdout is not None:
+            # Held-out predictions stored at training time; no model inference needed
+            y_test, _, predictions = holdout
+        else:
+            # Held-out subjects of the shared grouped split
+            test = load_split(dataset).test
+            y_test = dataset.y.iloc[test]
+
+            # Scale the features with the bundle's fitted scaler
+            X_test_scaled = bundle.scaler.transform(dataset.X[feature_columns].iloc[test])
+
+            # Predict once per model and share the results across figures
+            predictions = compute_predictions(bundle, X_test_scaled)
+        importances = {name: bundle.models[name].feature_importances_
+                       for name in ['Random Forest', 'Decision Tree']
+                       if name in bundle.models and hasattr(bundle.models[name], 'feature_importances_')}
+
+        if 'confusion_matrices' in stale:
+            jobs['confusion_matrices'] = (predictions, y_test)
+        if 'model_comparison' in stale:
+            jobs['model_comparison'] = (predictions, y_test)
+        if 'feature_importance' in stale:
+            jobs['feature_importance'] = (importances, feature_columns)
+        if 'roc_curves' in stale:
+            jobs['roc_curves'] = (predictions, y_test)
+
+    # Render the stale figures in parallel
+    cache = load_figure_cache()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(_render, figure, job_args) for figure, job_args in jobs.items()]
+        for future in futures:
+            figure, seconds = future.result()
+            cache[figure] = input_keys[FIGURES[figure][1]]
+            print(f"Rendered {FIGURES[figure][0]} in {seconds:.2f}s")
+    save_figure_cache(cache)
+
+    # Publish the new renditions under content-hashed names for the dashboard
+    build_assets()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,164 @@
+import argparse
+import copy
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+
+from bundles import ModelBundle, carried_provenance, read_manifest, write_bundle
+from data_loader import append_rows, load_dataset
+from ensemble import EnsembleScorer, _predict
+from evaluation import classification_metrics
+from model_comparison import model_families
+from splits import subject_ids
+
+
+def incremental_update(new_rows_path, version=None, threshold=0.02, validation_fraction=0.2,
+                       activate=True, seed=42):
+    """Fold newly labeled rows into a bundle without retraining from scratch
+
+    The bundle's dataset plus the new rows are written to a new CSV named by
+    their content, so the original file is never modified and a rerun reuses
+    it. The new rows are split by subject into update and validation rows.
+    Models with ``partial_fit`` (e.g. Naive Bayes) are updated in place, and
+    a model is fully refit with its tuned parameters only when its accuracy
+    on the validation rows drops more than ``threshold`` below the accuracy
+    recorded in the bundle. The bundle's scaler is kept, so unchanged models
+    keep scoring in the feature space they were trained in. Calibration
+    tables of updated or refit models no longer fit them and are dropped,
+    along with the ensemble table fitted on the old members.
+    """
+    bundle = ModelBundle.load(version)
+    holdout = bundle.holdout_predictions()
+    if holdout is None:
+        raise ValueError(f"Bundle {bundle.version} has no held-out predictions; retrain it with model_comparison.py")
+    _, holdout_index, _ = holdout
+
+    parent_path = bundle.manifest['dataset']
+    old_rows = len(load_dataset(parent_path))
+    with open(new_rows_path, 'rb') as f:
+        key = hashlib.sha256(f"{bundle.dataset_hash}:".encode() + f.read()).hexdigest()[:12]
+    stem, ext = os.path.splitext(parent_path)
+    dataset_path = f"{stem}+{key}{ext}"
+    if os.path.exists(dataset_path):
+        dataset = load_dataset(dataset_path)
+    else:
+        dataset = append_rows(parent_path, pd.read_csv(new_rows_path), output_path=dataset_path)
+    X = dataset.X[bundle.feature_columns].to_numpy()
+    y = np.asarray(dataset.status, dtype=int)
+
+    # Reserve the recordings of some new subjects for validation; they join the
+    # held-out set. Subjects already on one side of the split stay there.
+    new_index = np.arange(old_rows, len(dataset))
+    subjects = subject_ids(dataset.names)
+    held_out = set(subjects[holdout_index])
+    trained = set(subjects[:old_rows]) - held_out
+    new_subjects = np.random.default_rng(seed).permutation(
+        sorted(set(subjects[new_index]) - held_out - trained))
+    validation_subjects = held_out | set(new_subjects[:int(round(len(new_subjects) * validation_fraction))])
+    is_validation = np.isin(subjects[new_index], list(validation_subjects))
+    validation_new = new_index[is_validation]
+    update_index = new_index[~is_validation]
+    n_validation = len(validation_new)
+    holdout_index = np.concatenate([holdout_index, validation_new])
+
+    scaler = bundle.scaler
+    X_update = scaler.transform(X[update_index])
+    X_holdout = scaler.transform(X[holdout_index])
+    y_holdout = y[holdout_index]
+
+    training = bundle.manifest.get('training', {})
+    models = {}
+    report = {}
+    for name, model in bundle.models.items():
+        start = time.perf_counter()
+        action = 'kept'
+        table = bundle.scorer.tables.get(name)
+        if hasattr(model, 'partial_fit') and len(update_index):
+            model = copy.deepcopy(model)
+            model.partial_fit(X_update, y[update_index])
+            action = 'partial_fit'
+            table = None
+
+        baseline = bundle.metrics[name]['accuracy'] if bundle.metrics and name in bundle.metrics else None
+        accuracy = accuracy_score(y_holdout, _predict(model, X_holdout, table)[0])
+        if baseline is not None and baseline - accuracy > threshold:
+            # Drifted: refit on every non-held-out row with the tuned hyperparameters
+            train_mask = np.ones(len(dataset), dtype=bool)
+            train_mask[holdout_index] = False
+            model = clone(model_families()[name][0]).set_params(**training.get(name, {}).get('best_params', {}))
+            model.fit(scaler.transform(X[train_mask]), y[train_mask])
+            accuracy = accuracy_score(y_holdout, model.predict(X_holdout))
+            action = 'refit'
+
+        models[name] = model
+        report[name] = {
+            'action': action,
+            'baseline_accuracy': baseline,
+            'accuracy': float(accuracy),
+            'seconds': time.perf_counter() - start
+        }
+
+    calibration = copy.deepcopy(bundle.manifest.get('calibration'))
+    if calibration:
+        stale = [name for name in calibration['models'] if report[name]['action'] != 'kept']
+        calibration['models'] = {name: table for name, table in calibration['models'].items()
+                                 if name not in stale}
+        # The ensemble table was fitted on the old members' mean probability
+        if calibration.get('ensemble') and any(stats['action'] != 'kept' for stats in report.values()):
+            del calibration['ensemble']
+            stale.append('ensemble')
+        if stale:
+            calibration['stale_models'] = stale
+
+    # Held-out predictions and metrics for the updated bundle, scored as served
+    scored = EnsembleScorer(models, calibration=calibration).score(X_holdout)
+    predictions = {name: (scored.labels[name], scored.probabilities[name]) for name in models}
+    metrics = {name: classification_metrics(y_holdout, y_pred, y_proba)
+               for name, (y_pred, y_proba) in predictions.items()}
+    # Calibration is carried separately, without the tables of models that changed
+    extra = carried_provenance(bundle.manifest, exclude=('calibration',))
+    if calibration:
+        extra['calibration'] = calibration
+    extra.update({
+        'parent_version': bundle.version,
+        'parent_dataset': parent_path,
+        'incremental': {'new_rows': len(new_index), 'validation_rows': int(n_validation), 'models': report}
+    })
+    new_version = write_bundle(models, scaler, bundle.feature_columns, dataset_path, metrics=metrics,
+                               activate=activate, extra=extra,
+                               holdout={'y_true': y_holdout, 'index': holdout_index, 'predictions': predictions},
+                               input_columns=bundle.schema.input_columns)
+    return new_version, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the current model bundle with newly labeled recordings')
+    parser.add_argument('new_rows', help='CSV of labeled recordings in the PDdatasetN.csv layout')
+    parser.add_argument('--bundle-version', help='Bundle to update (default: the current bundle)')
+    parser.add_argument('--threshold', type=float, default=0.02,
+                        help='Accuracy drop on validation rows that triggers a full refit')
+    parser.add_argument('--validation-fraction', type=float, default=0.2,
+                        help='Share of the new subjects held out for validation')
+    parser.add_argument('--no-activate', action='store_true', help='Do not make the updated bundle current')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    version, report = incremental_update(args.new_rows, args.bundle_version, args.threshold,
+                                         args.validation_fraction, activate=not args.no_activate)
+    for name, stats in report.items():
+        baseline = f"{stats['baseline_accuracy']:.4f}" if stats['baseline_accuracy'] is not None else 'n/a'
+        print(f"{name}: {stats['action']}, accuracy {baseline} -> {stats['accuracy']:.4f} "
+              f"({stats['seconds']:.2f}s)")
+    print(f"Saved model bundle {version} in {time.perf_counter() - start:.2f}s")
+    stale = read_manifest(version).get('calibration', {}).get('stale_models')
+    if stale:
+        print(f"Calibration dropped for {', '.join(stale)}; rerun calibration.py to recalibrate them")
+
+
+if __name__ == '__main__':
+    main()
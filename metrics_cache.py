@@ -0,0 +1,43 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+METRICS_CACHE_PATH = 'metrics_cache.json'
+
+
+def fingerprint_files(paths):
+    """Return a SHA-256 fingerprint over the contents of the given files"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_cached_metrics(fingerprint, path=METRICS_CACHE_PATH):
+    """Return the cached metrics if they were computed for this fingerprint"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable metrics cache {path}: {str(e)}")
+        return None
+    if cached.get('fingerprint') != fingerprint:
+        logger.info("Metrics cache is stale, artifacts have changed")
+        return None
+    return cached.get('metrics')
+
+
+def save_cached_metrics(fingerprint, metrics, path=METRICS_CACHE_PATH):
+    """Persist metrics next to the model artifacts, replacing the file atomically"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'metrics': metrics}, f, indent=2)
+    os.replace(tmp_path, path)
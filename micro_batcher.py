@@ -0,0 +1,77 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Merge concurrent single-row requests into one vectorized model call
+
+    Rows submitted within ``max_wait`` seconds of each other (up to
+    ``max_batch_size``) are stacked and passed to ``score_fn(group, features)``
+    on an inference thread pool; ``group`` separates rows that must not be
+    scored together, e.g. different bundles or voting modes. ``score_fn``
+    returns one result per row.
+    """
+
+    def __init__(self, score_fn, max_batch_size=32, max_wait=0.002, workers=2):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.workers = workers
+        self._queue = None
+        self._executor = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each (pre-forked) worker process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+            threading.Thread(target=self._collect, name='micro-batcher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, group, features):
+        """Queue one (1, n_features) row and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((group, features, future))
+        return future
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[0], []).append(item)
+            for group, items in groups.items():
+                self._executor.submit(self._run, group, items)
+
+    def _run(self, group, items):
+        try:
+            features = np.vstack([features for _, features, _ in items])
+            results = self.score_fn(group, features)
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(items, results):
+            future.set_result(result)
@@ -1,101 +1,221 @@
-import pandas as pd
-import numpy as np
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.model_selection import train_test_split
+from joblib import Memory
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, cross_validate
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.svm import SVC
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
 
-# Load the dataset from local file
-df = pd.read_csv('PDdatasetN.csv')
-
-# Drop the 'name' column as it's not needed for the model
-if 'name' in df.columns:
-    df = df.drop(['name'], axis=1)
-
-# Ensure status is integer type for classification
-df['status'] = df['status'].astype(int)
-
-# Split the data into features and target
-X = df.drop('status', axis=1)
-y = df['status']
-
-# Split the data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Scale the features
-scaler = MinMaxScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# Initialize models
-models = {
-    'SVM': SVC(random_state=42),
-    'Random Forest': RandomForestClassifier(random_state=42),
-    'Gradient Boosting': GradientBoostingClassifier(random_state=42)
-}
-
-# Train models and store results
-results = {}
-for name, model in models.items():
-    # Train the model
-    model.fit(X_train_scaled, y_train)
-    
-    # Make predictions
-    y_pred = model.predict(X_test_scaled)
-    
-    # Calculate metrics
-    accuracy = accuracy_score(y_test, y_pred)
-    cm = confusion_matrix(y_test, y_pred)
-    precision = precision_score(y_test, y_pred, average='weighted')
-    recall = recall_score(y_test, y_pred, average='weighted')
-    f1 = f1_score(y_test, y_pred, average='weighted')
-    
-    # Store results
-    results[name] = {
-        'accuracy': accuracy,
-        'confusion_matrix': cm,
-        'precision': precision,
-        'recall': recall,
-        'f1': f1
+from bundles import write_bundle
+from ensemble import EnsembleScorer
+from data_loader import load_dataset
+from evaluation import classification_metrics
+from feature_selection import select_features
+from splits import load_split
+
+DATASET_PATH = 'PDdatasetN.csv'
+CACHE_DIR = os.path.join('.cache', 'training')
+
+
+def model_families(n_jobs=1):
+    """Return each model family with its hyperparameter grid"""
+    return {
+        'Random Forest': (RandomForestClassifier(random_state=42, n_jobs=n_jobs),
+                          {'n_estimators': [100, 300], 'max_depth': [None, 10], 'max_features': ['sqrt', 0.5]}),
+        'SVM': (SVC(random_state=42),
+                {'C': [0.1, 1, 10, 100], 'gamma': ['scale', 0.01, 0.1]}),
+        'KNN': (KNeighborsClassifier(n_jobs=n_jobs),
+                {'n_neighbors': [3, 5, 7, 9], 'weights': ['uniform', 'distance']}),
+        'Decision Tree': (DecisionTreeClassifier(random_state=42),
+                          {'max_depth': [None, 5, 10], 'min_samples_leaf': [1, 2, 5]}),
+        'Naive Bayes': (GaussianNB(),
+                        {'var_smoothing': [1e-9, 1e-8, 1e-7]}),
+        'Logistic Regression': (LogisticRegression(max_iter=1000),
+                                {'C': [0.01, 0.1, 1, 10]}),
+        'Gradient Boosting': (GradientBoostingClassifier(random_state=42),
+                              {'n_estimators': [100, 200], 'learning_rate': [0.05, 0.1], 'max_depth': [2, 3]})
+    }
+
+
+def search_model(name, X_train, y_train, folds, n_jobs, cache_dir):
+    """Cross-validated grid search for one model family, run in a worker process
+
+    The scaler is part of the pipeline so it is fitted per fold; the pipeline
+    memory caches those fitted scalers across all grid points of a fold.
+    ``folds`` is a fold count or precomputed (train, test) index pairs.
+    """
+    estimator, grid = model_families(n_jobs)[name]
+    pipeline = Pipeline([('scaler', MinMaxScaler()), ('model', estimator)],
+                        memory=Memory(os.path.join(cache_dir, name.lower().replace(' ', '_')), verbose=0))
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42) if isinstance(folds, int) else folds
+
+    start = time.perf_counter()
+    search = GridSearchCV(pipeline, {f'model__{key}': values for key, values in grid.items()},
+                          cv=cv, scoring='accuracy', n_jobs=n_jobs)
+    search.fit(X_train, y_train)
+    search_seconds = time.perf_counter() - start
+
+    # Per-fold timings and scores for the selected configuration
+    folds_report = cross_validate(search.best_estimator_, X_train, y_train, cv=cv, scoring='accuracy')
+
+    return name, {
+        'model': search.best_estimator_.named_steps['model'],
+        'best_params': {key.split('__', 1)[1]: value for key, value in search.best_params_.items()},
+        'cv_accuracy': float(search.best_score_),
+        'search_seconds': search_seconds,
+        'fold_fit_seconds': [float(t) for t in folds_report['fit_time']],
+        'fold_score_seconds': [float(t) for t in folds_report['score_time']],
+        'fold_accuracy': [float(s) for s in folds_report['test_score']]
     }
 
-# Plot accuracy comparison
-plt.figure(figsize=(10, 6))
-accuracies = [results[model]['accuracy'] for model in models.keys()]
-plt.bar(models.keys(), accuracies)
-plt.title('Model Accuracy Comparison')
-plt.ylabel('Accuracy')
-plt.ylim(0.8, 1.0)  # Set y-axis limits to better visualize differences
-plt.grid(True, axis='y')
-plt.savefig('model_accuracy_comparison.png')
-plt.close()
-
-# Print detailed metrics for each model
-for name, metrics in results.items():
-    print(f"\nModel: {name}")
-    print(f"Accuracy: {metrics['accuracy']:.4f}")
-    print(f"Precision: {metrics['precision']:.4f}")
-    print(f"Recall: {metrics['recall']:.4f}")
-    print(f"F1-score: {metrics['f1']:.4f}")
-    
-    # Plot confusion matrix
-    plt.figure(figsize=(6, 4))
-    sns.heatmap(metrics['confusion_matrix'], annot=True, fmt='d', cmap='Blues')
-    plt.title(f'Confusion Matrix - {name}')
-    plt.xlabel('Predicted')
-    plt.ylabel('Actual')
-    plt.savefig(f'confusion_matrix_{name.lower().replace(" ", "_")}.png')
+
+def train_models(X_train, y_train, names, folds=5, workers=None, n_jobs=1, cache_dir=CACHE_DIR):
+    """Search every model family across a process pool and return results by name"""
+    trained = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(search_model, name, X_train, y_train, folds, n_jobs, cache_dir)
+                   for name in names]
+        for future in futures:
+            name, result = future.result()
+            trained[name] = result
+            print(f"{name}: CV accuracy {result['cv_accuracy']:.4f} "
+                  f"in {result['search_seconds']:.2f}s, params {result['best_params']}")
+            fold_times = ', '.join(f"{t:.3f}s" for t in result['fold_fit_seconds'])
+            print(f"  per-fold fit time: {fold_times}")
+    return {name: trained[name] for name in names}
+
+
+def plot_results(results):
+    # Plot accuracy comparison
+    plt.figure(figsize=(12, 6))
+    accuracies = [results[model]['accuracy'] for model in results]
+    plt.bar(list(results.keys()), accuracies)
+    plt.title('Model Accuracy Comparison')
+    plt.ylabel('Accuracy')
+    plt.ylim(0.8, 1.0)  # Set y-axis limits to better visualize differences
+    plt.xticks(rotation=30)
+    plt.grid(True, axis='y')
+    plt.tight_layout()
+    plt.savefig('model_accuracy_comparison.png')
     plt.close()
 
-# Determine the best model
-best_model = max(results.items(), key=lambda x: x[1]['accuracy'])
-print(f"\nBest Model: {best_model[0]} with accuracy: {best_model[1]['accuracy']:.4f}")
+    for name, metrics in results.items():
+        # Plot confusion matrix
+        plt.figure(figsize=(6, 4))
+        sns.heatmap(metrics['confusion_matrix'], annot=True, fmt='d', cmap='Blues')
+        plt.title(f'Confusion Matrix - {name}')
+        plt.xlabel('Predicted')
+        plt.ylabel('Actual')
+        plt.savefig(f'confusion_matrix_{name.lower().replace(" ", "_")}.png')
+        plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train, tune and compare all model families')
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--folds', type=int, default=5, help='Number of cross-validation folds')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes for model families (default: one per CPU)')
+    parser.add_argument('--n-jobs', type=int, default=1,
+                        help='Threads/processes inside each search and forest')
+    parser.add_argument('--models', nargs='+', choices=list(model_families()),
+                        default=list(model_families()), help='Model families to train')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--select-features', action='store_true',
+                        help='Prune redundant and low-importance features before training')
+    parser.add_argument('--corr-threshold', type=float, default=0.95,
+                        help='Absolute correlation above which one feature of a pair is dropped')
+    parser.add_argument('--selection-tolerance', type=float, default=0.005,
+                        help='Largest allowed drop in cross-validated accuracy from feature selection')
+    args = parser.parse_args()
+
+    total_start = time.perf_counter()
+    dataset = load_dataset(args.dataset)
+    X, y = dataset.X, dataset.y
+
+    # Grouped by subject, so no subject's recordings appear in both train and test
+    split = load_split(dataset, folds=args.folds)
+    X_train, X_test = X.iloc[split.train], X.iloc[split.test]
+    y_train, y_test = y.iloc[split.train], y.iloc[split.test]
+    cv_folds = split.cv_folds()
+
+    extra = {'split': split.describe()}
+    if args.select_features:
+        # Selection only sees the training split, so the test set stays untouched
+        selected, selection_report = select_features(X_train, y_train, args.corr_threshold,
+                                                     args.selection_tolerance, folds=cv_folds,
+                                                     n_jobs=args.n_jobs)
+        print(f"Selected {len(selected)} of {X.shape[1]} features "
+              f"(CV accuracy {selection_report['baseline_cv_accuracy']:.4f} -> "
+              f"{selection_report['selected_cv_accuracy']:.4f})")
+        extra['feature_selection'] = selection_report
+        X_train, X_test = X_train[selected], X_test[selected]
+
+    trained = train_models(X_train, y_train, args.models, folds=cv_folds, workers=args.workers,
+                           n_jobs=args.n_jobs, cache_dir=args.cache_dir)
+
+    # The searches refit each pipeline's scaler on the full training split, so this matches it
+    scaler = MinMaxScaler()
+    scaler.fit(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    # Evaluate on the held-out split with one probability pass per model, as served
+    models = {name: result['model'] for name, result in trained.items()}
+    scored = EnsembleScorer(models).score(X_test_scaled)
+    results = {}
+    for name in models:
+        y_pred = scored.labels[name]
+        results[name] = {
+            'accuracy': accuracy_score(y_test, y_pred),
+            'confusion_matrix': confusion_matrix(y_test, y_pred),
+            'precision': precision_score(y_test, y_pred, average='weighted'),
+            'recall': recall_score(y_test, y_pred, average='weighted'),
+            'f1': f1_score(y_test, y_pred, average='weighted'),
+            'y_pred': y_pred,
+            'y_proba': scored.probabilities[name]
+        }
+
+    plot_results(results)
+
+    # Print detailed metrics for each model
+    for name, metrics in results.items():
+        print(f"\nModel: {name}")
+        print(f"Accuracy: {metrics['accuracy']:.4f}")
+        print(f"Precision: {metrics['precision']:.4f}")
+        print(f"Recall: {metrics['recall']:.4f}")
+        print(f"F1-score: {metrics['f1']:.4f}")
+
+    # Determine the best model
+    best_model = max(results.items(), key=lambda x: x[1]['accuracy'])
+    print(f"\nBest Model: {best_model[0]} with accuracy: {best_model[1]['accuracy']:.4f}")
+
+    # Save all models with the scaler they were trained with as a versioned bundle
+    bundle_metrics = {name: classification_metrics(y_test, result['y_pred'], result['y_proba'])
+                      for name, result in results.items()}
+    holdout = {
+        'y_true': y_test.to_numpy(),
+        'index': X_test.index.to_numpy(),
+        'predictions': {name: (result['y_pred'], result['y_proba']) for name, result in results.items()}
+    }
+    training_report = {name: {key: value for key, value in result.items() if key != 'model'}
+                       for name, result in trained.items()}
+    extra.update({'best_model': best_model[0], 'training': training_report})
+    version = write_bundle(models, scaler, X_train.columns, args.dataset, metrics=bundle_metrics,
+                           extra=extra, holdout=holdout, input_columns=X.columns)
+    print(f"Saved model bundle {version}")
+    print(f"Total wall time: {time.perf_counter() - total_start:.2f}s")
+
 
-# Save the best model
-import joblib
-best_model_instance = models[best_model[0]]
-joblib.dump(best_model_instance, 'best_model.pkl')
-joblib.dump(scaler, 'scaler.pkl') 
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import importlib
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Packages whose estimators the bundles pickle. Importing them up front keeps the
+# loader threads from racing on scikit-learn's first-time submodule imports.
+ESTIMATOR_MODULES = ('compact_estimators', 'sklearn.ensemble', 'sklearn.linear_model', 'sklearn.naive_bayes',
+                     'sklearn.neighbors', 'sklearn.preprocessing', 'sklearn.svm', 'sklearn.tree')
+
+
+def _array_footprint(obj):
+    """Return (private_bytes, mmap_bytes) held in numpy arrays reachable from obj"""
+    private_bytes = 0
+    mmap_bytes = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            base = item
+            while isinstance(base, np.ndarray) and not isinstance(base, np.memmap) and base.base is not None:
+                base = base.base
+            if isinstance(base, np.memmap):
+                mmap_bytes += item.nbytes
+            else:
+                private_bytes += item.nbytes
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__'):
+            stack.extend(vars(item).values())
+        elif type(item).__module__.startswith('sklearn'):
+            # Cython objects such as sklearn's Tree expose their arrays via pickle state
+            try:
+                stack.append(item.__getstate__())
+            except Exception:
+                pass
+    return private_bytes, mmap_bytes
+
+
+def load_artifact(path, mmap_mode='r'):
+    """Load a joblib/pickle artifact and return it with its load statistics
+
+    With ``mmap_mode`` set, numpy arrays stored uncompressed in the joblib file
+    (e.g. the KNN training set) are mapped read-only from disk, so forked workers
+    share the same pages. Arrays that scikit-learn copies on unpickling, such as
+    tree node tables, stay private.
+    """
+    start = time.perf_counter()
+    obj = joblib.load(path, mmap_mode=mmap_mode)
+    load_seconds = time.perf_counter() - start
+    private_bytes, mmap_bytes = _array_footprint(obj)
+    stats = {
+        'path': path,
+        'load_seconds': load_seconds,
+        'private_array_bytes': private_bytes,
+        'mmap_array_bytes': mmap_bytes
+    }
+    return obj, stats
+
+
+class ModelRegistry(Mapping):
+    """Read-only mapping of model name to estimator, loaded on first access
+
+    ``load_all`` loads every artifact that has not been loaded yet across a
+    thread pool; joblib releases the GIL while reading and mapping arrays.
+    Estimator modules are imported and the first artifact is loaded serially
+    before fanning out, since concurrent first-time imports can deadlock.
+    """
+
+    def __init__(self, artifacts, mmap_mode='r'):
+        self.artifacts = dict(artifacts)
+        self.mmap_mode = mmap_mode
+        self._loaded = {}
+        self._stats = {}
+        self._locks = {name: threading.Lock() for name in self.artifacts}
+
+    def __getitem__(self, name):
+        if name not in self.artifacts:
+            raise KeyError(name)
+        model = self._loaded.get(name)
+        if model is not None:
+            return model
+        with self._locks[name]:
+            if name not in self._loaded:
+                model, stats = load_artifact(self.artifacts[name], mmap_mode=self.mmap_mode)
+                self._stats[name] = stats
+                self._loaded[name] = model
+                logger.info(f"Loaded {name} from {stats['path']} in {stats['load_seconds']:.3f}s")
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self.artifacts)
+
+    def __len__(self):
+        return len(self.artifacts)
+
+    def load_all(self, max_workers=None):
+        """Load all artifacts in parallel and return the registry"""
+        pending = [name for name in self.artifacts if name not in self._loaded]
+        if not pending:
+            return self
+        for module in ESTIMATOR_MODULES:
+            importlib.import_module(module)
+        self[pending[0]]
+        if len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers or len(pending) - 1) as pool:
+                list(pool.map(self.__getitem__, pending[1:]))
+        return self
+
+    def stats(self):
+        """Return per-artifact load time and array footprint for loaded artifacts"""
+        return {name: dict(stats) for name, stats in self._stats.items()}
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def feature_key(version, features, voting='hard'):
+    """Canonical cache key for one feature vector already in training column order"""
+    return version, voting, np.ascontiguousarray(features, dtype=np.float64).tobytes()
+
+
+class PredictionCache:
+    """Bounded LRU cache of prediction responses with a time-to-live
+
+    Keys include the model bundle version, so entries from a swapped-out bundle
+    can never be served; ``clear`` drops them eagerly on reload.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
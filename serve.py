@@ -0,0 +1,63 @@
+import argparse
+import logging
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the prediction server in production mode")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (more than one requires gunicorn)')
+    parser.add_argument('--threads', type=int, default=4, help='Request threads per worker')
+    parser.add_argument('--inference-threads', type=int, default=2,
+                        help='Threads running model inference per worker')
+    parser.add_argument('--micro-batch-size', type=int, default=32,
+                        help='Largest number of concurrent /predict rows merged into one call (1 disables)')
+    parser.add_argument('--micro-batch-wait-ms', type=float, default=2.0,
+                        help='How long to wait for more rows before scoring a micro-batch')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    # app.py reads its serving configuration from the environment at import time
+    os.environ['MICRO_BATCH_SIZE'] = str(args.micro_batch_size)
+    os.environ['MICRO_BATCH_WAIT_MS'] = str(args.micro_batch_wait_ms)
+    os.environ['INFERENCE_THREADS'] = str(args.inference_threads)
+    os.environ['LOG_LEVEL'] = args.log_level
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is None:
+        if args.workers > 1:
+            parser.error(f"--workers {args.workers} requires gunicorn (pip install gunicorn); "
+                         f"pass --workers 1 to serve from a single process")
+        logging.basicConfig(level=args.log_level)
+        logging.getLogger(__name__).warning(
+            "gunicorn is not installed; serving from a single threaded process")
+        from werkzeug.serving import run_simple
+        from app import app
+        run_simple(args.host, args.port, app, threaded=True)
+        return
+
+    class ProductionApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{args.host}:{args.port}')
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('worker_class', 'gthread')
+            # Load models once in the master so forked workers share their pages
+            self.cfg.set('preload_app', True)
+            self.cfg.set('loglevel', args.log_level.lower())
+
+        def load(self):
+            from app import app
+            return app
+
+    ProductionApplication().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import logging
+import os
+import re
+
+import numpy as np
+from sklearn.model_selection import StratifiedGroupKFold
+
+logger = logging.getLogger(__name__)
+
+SPLIT_CACHE_DIR = os.path.join('.cache', 'splits')
+
+# Split parameters at the end of a split key, e.g. <hash>-f5-t0.2-s42
+SPLIT_KEY_PATTERN = re.compile(r'-f(\d+)-t([0-9.e+-]+)-s(\d+)$')
+# phon_R01_S01_1 -> phon_R01_S01: recordings of one subject share this prefix,
+# including resampled copies such as phon_R01_S01_1_syn42
+SUBJECT_PATTERN = re.compile(r'^(.*?_S\d+)_\d+')
+
+
+def subject_ids(names):
+    """Map recording names to subject IDs
+
+    Names that do not follow the ``<study>_S<subject>_<recording>`` pattern
+    (e.g. synthetic rows) are treated as subjects of their own.
+    """
+    subjects = []
+    for name in names:
+        match = SUBJECT_PATTERN.match(str(name))
+        subjects.append(match.group(1) if match else str(name))
+    return np.asarray(subjects)
+
+
+class Split:
+    """Grouped held-out split and cross-validation folds of one dataset
+
+    ``train`` and ``test`` index dataset rows. ``fold`` gives the
+    cross-validation fold of every training row, so ``cv_folds()`` yields
+    positions into the training rows, as scikit-learn's ``cv`` expects.
+    """
+
+    def __init__(self, train, test, fold, key):
+        self.train = train
+        self.test = test
+        self.fold = fold
+        self.key = key
+
+    @property
+    def n_folds(self):
+        return int(self.fold.max()) + 1
+
+    def cv_folds(self):
+        positions = np.arange(len(self.train))
+        return [(positions[self.fold != k], positions[self.fold == k]) for k in range(self.n_folds)]
+
+    def describe(self):
+        return {'key': self.key, 'train_rows': len(self.train), 'test_rows': len(self.test),
+                'folds': self.n_folds}
+
+
+def _split_path(dataset, folds, test_size, seed, cache_dir):
+    return os.path.join(cache_dir, f"{dataset.source_hash[:16]}-f{folds}-t{test_size:g}-s{seed}.npz")
+
+
+def _compute_split(subjects, y, folds, test_size, seed):
+    # The held-out split is one fold of a grouped, stratified k-fold
+    outer = StratifiedGroupKFold(n_splits=max(2, int(round(1 / test_size))), shuffle=True, random_state=seed)
+    train, test = next(outer.split(np.zeros(len(y)), y, subjects))
+
+    inner = StratifiedGroupKFold(n_splits=folds, shuffle=True, random_state=seed)
+    fold = np.empty(len(train), dtype=np.int8)
+    for k, (_, fold_rows) in enumerate(inner.split(np.zeros(len(train)), y[train], subjects[train])):
+        fold[fold_rows] = k
+    return train.astype(np.int32), test.astype(np.int32), fold
+
+
+def split_params(key):
+    """Return (folds, test_size, seed) encoded in a split key, as recorded in bundle manifests"""
+    match = SPLIT_KEY_PATTERN.search(key)
+    if match is None:
+        raise ValueError(f"Not a split key: {key}")
+    return int(match.group(1)), float(match.group(2)), int(match.group(3))
+
+
+def load_split(dataset, folds=5, test_size=0.2, seed=42, cache_dir=SPLIT_CACHE_DIR):
+    """Return the grouped-by-subject split of a dataset, computing it once per dataset version
+
+    Index arrays are stored next to the typed dataset cache, keyed by the
+    dataset's content hash and the split parameters, so training, evaluation
+    and plotting all see the same rows.
+    """
+    path = _split_path(dataset, folds, test_size, seed, cache_dir)
+    key = os.path.splitext(os.path.basename(path))[0]
+    if not os.path.exists(path):
+        if dataset.names is None:
+            raise ValueError("Grouped splits need the 'name' column to identify subjects")
+        subjects = subject_ids(dataset.names)
+        train, test, fold = _compute_split(subjects, np.asarray(dataset.status), folds, test_size, seed)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, train=train, test=test, fold=fold)
+        os.replace(tmp_path, path)
+        logger.info(f"Computed grouped split {key} over {len(np.unique(subjects))} subjects")
+
+    with np.load(path) as stored:
+        return Split(stored['train'], stored['test'], stored['fold'], key)
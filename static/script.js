@@ -262,20 +262,8 @@ document.getElementById('predictionForm').addEventListener('submit', async funct
     }
 });
 
-// Initialize model performance data from server
+// Model metrics are loaded from /api/metrics by the page; only restore history here
 document.addEventListener('DOMContentLoaded', function() {
-    // Get model metrics from the server
-    fetch('/')
-        .then(response => response.text())
-        .then(html => {
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(html, 'text/html');
-            const metricsScript = doc.querySelector('script#model-metrics');
-            if (metricsScript) {
-                modelPerformance = JSON.parse(metricsScript.textContent);
-                populateModelComparison();
-            }
-        });
     updateHistoryTable();
 });
 
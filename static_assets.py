@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = 'static'
+IMAGES_DIR = os.path.join('docs', 'images')
+ASSETS_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_FILE = 'manifest.json'
+# Already-compressed formats (PNG, WebP) gain nothing from gzip or brotli
+COMPRESSIBLE = ('.js', '.css', '.svg', '.json', '.html')
+# Responses for these file names may be cached forever, since a change gets a new name
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _sources(static_dir, images_dir):
+    """Logical asset paths mapped to the files they are built from
+
+    The tracked figures in ``static/images`` are used until
+    generate_visualizations.py writes newer renditions to ``images_dir``.
+    """
+    sources = {}
+    for name in sorted(os.listdir(static_dir)):
+        path = os.path.join(static_dir, name)
+        if os.path.isfile(path):
+            sources[name] = path
+    for directory in (os.path.join(static_dir, 'images'), images_dir):
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if os.path.isfile(path) and not name.startswith('.'):
+                    sources[f'images/{name}'] = path
+    return sources
+
+
+def _prune(assets_dir, keep):
+    """Remove hashed files, and their compressed variants, that are not in ``keep``"""
+    current = set(keep)
+    for name in os.listdir(assets_dir):
+        base = name[:-3] if name.endswith(('.gz', '.br')) else name
+        if name == MANIFEST_FILE or name.endswith('.tmp') or base in current:
+            continue
+        try:
+            os.remove(os.path.join(assets_dir, name))
+        except OSError:
+            pass
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compress(path, data):
+    """Write .gz and, when the optional brotli package is installed, .br variants"""
+    if not os.path.exists(f'{path}.gz'):
+        _write_atomic(f'{path}.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return
+    if not os.path.exists(f'{path}.br'):
+        _write_atomic(f'{path}.br', brotli.compress(data, quality=11))
+
+
+def build_assets(static_dir=STATIC_DIR, images_dir=IMAGES_DIR, assets_dir=ASSETS_DIR):
+    """Copy static files and figures to content-hashed names with precompressed variants
+
+    Returns the manifest mapping logical paths (``script.js``,
+    ``images/roc_curves.webp``) to hashed file names in ``assets_dir``.
+    Files whose hash already exists are not rewritten, so rebuilding is cheap.
+    Files of the previous build are kept for servers and pages still using
+    its manifest; anything older is removed.
+    """
+    previous = load_manifest(assets_dir)
+    os.makedirs(assets_dir, exist_ok=True)
+    manifest = {}
+    for logical, path in _sources(static_dir, images_dir).items():
+        with open(path, 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(logical.replace('/', '-'))
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+        target = os.path.join(assets_dir, hashed)
+        if not os.path.exists(target):
+            shutil.copyfile(path, f"{target}.{os.getpid()}.tmp")
+            os.replace(f"{target}.{os.getpid()}.tmp", target)
+        if ext in COMPRESSIBLE:
+            _compress(target, data)
+        manifest[logical] = hashed
+
+    _write_atomic(os.path.join(assets_dir, MANIFEST_FILE), json.dumps(manifest, indent=2).encode())
+    _prune(assets_dir, set(manifest.values()) | set(previous.values()))
+    logger.info(f"Built {len(manifest)} static assets in {assets_dir}")
+    return manifest
+
+
+def load_manifest(assets_dir=ASSETS_DIR):
+    path = os.path.join(assets_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def manifest_mtime(assets_dir=ASSETS_DIR):
+    try:
+        return os.stat(os.path.join(assets_dir, MANIFEST_FILE)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def choose_encoding(path, accept_encoding):
+    """Return (file to send, Content-Encoding or None) for a client's Accept-Encoding header"""
+    accepted = {token.split(';')[0].strip() for token in accept_encoding.split(',')}
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    print(f"Built {len(build_assets())} assets in {ASSETS_DIR}")